@@ -23,8 +23,9 @@ DROP TABLE IF EXISTS `customers`;
 /*!40101 SET @saved_cs_client     = @@character_set_client */;
 /*!50503 SET character_set_client = utf8mb4 */;
 CREATE TABLE `customers` (
-  `id` varchar(36) NOT NULL,
+  `id` bigint NOT NULL AUTO_INCREMENT,
   `queue_number` varchar(10) NOT NULL,
+  `queue_date` date NOT NULL,
   `name` varchar(100) NOT NULL,
   `category` varchar(50) NOT NULL,
   `service` varchar(100) DEFAULT NULL,
@@ -34,9 +35,60 @@ CREATE TABLE `customers` (
   `status` varchar(20) NOT NULL,
   `arrival_timestamp` datetime NOT NULL,
   `completion_timestamp` datetime DEFAULT NULL,
+  `counter_id` int DEFAULT NULL,
+  `service_start_timestamp` datetime DEFAULT NULL,
   PRIMARY KEY (`id`),
-  UNIQUE KEY `queue_number` (`queue_number`),
-  UNIQUE KEY `queue_number_2` (`queue_number`)
+  UNIQUE KEY `uq_customers_queue_date_number` (`queue_date`,`queue_number`),
+  KEY `ix_customers_status_arrival` (`status`,`arrival_timestamp`),
+  KEY `ix_customers_completion` (`completion_timestamp`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `queue_counters`
+--
+
+DROP TABLE IF EXISTS `queue_counters`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `queue_counters` (
+  `prefix` varchar(5) NOT NULL,
+  `queue_date` date NOT NULL,
+  `last_value` int NOT NULL,
+  PRIMARY KEY (`prefix`,`queue_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `daily_service_stats`
+--
+
+DROP TABLE IF EXISTS `daily_service_stats`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `daily_service_stats` (
+  `stats_date` date NOT NULL,
+  `category` varchar(50) NOT NULL,
+  `urgency` int NOT NULL,
+  `arrived_count` int NOT NULL DEFAULT '0',
+  `completed_count` int NOT NULL DEFAULT '0',
+  `total_wait_seconds` double NOT NULL DEFAULT '0',
+  PRIMARY KEY (`stats_date`,`category`,`urgency`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `service_counters`
+--
+
+DROP TABLE IF EXISTS `service_counters`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `service_counters` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `name` varchar(50) NOT NULL,
+  `services` text,
+  PRIMARY KEY (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
@@ -1,32 +1,80 @@
+import os
+import gc
+import time
+import atexit
 import uuid
+import json
+import random
 import datetime
-import heapq      
-import threading  
-from flask import Flask, request, jsonify
+import threading
+import collections
+import click
+from flask import Flask, request, jsonify, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
+from sqlalchemy import func, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError, OperationalError
 from flask_cors import CORS
+from queue_engine import PriorityQueue, AGING_STEPS, aging_bonus, wait_minutes_at, parse_services, initial_priority_score
+from queue_stream import QueueBroadcaster, format_sse
+from queue_journal import QueueJournal, QueueCheckpointer, QueueRecord, entry_to_tuple
+from queue_server import RemoteQueueState, QueueRelay, queue_server_address, queue_server_authkey
+from metrics import MetricsRegistry
+from simulator import (ServiceTimes, SimulatedCustomer, SERVICE_TIME_WINDOW, DEFAULT_SERVICE_SECONDS,
+                       predict_wait_seconds, simulate, synthetic_day, parse_aging, parse_weights)
 
 # --- Setup and Configuration ---
 app = Flask(__name__)
-CORS(app) # Enable Cross-Origin Resource Sharing for the frontend
+CORS(app, expose_headers=['ETag', 'X-Server-Time']) # Enable Cross-Origin Resource Sharing for the frontend
 
 # Database Configuration
 DB_USER = 'root'
 DB_PASSWORD = 'mysqlpassword1234' # Your MySQL root password
 DB_HOST = 'localhost'
 DB_NAME = 'lto_queue_db'
-app.config['SQLALCHEMY_DATABASE_URI'] = f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}'
+# AYOSPILA_DATABASE_URI lets you point the app somewhere else (e.g. a SQLite file for testing).
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'AYOSPILA_DATABASE_URI', f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    # Each worker thread holds at most one connection, so the pool only needs to
+    # match the thread count (gunicorn.conf.py passes it in). Connections are
+    # recycled before MySQL's idle timeout and checked before use, so a worker
+    # that sat idle overnight doesn't fail its first request.
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('AYOSPILA_DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('AYOSPILA_DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': 10,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    }
+# Where the live queue is checkpointed so a restart can skip rebuilding it from the customers table.
+QUEUE_STATE_DIR = os.environ.get(
+    'AYOSPILA_QUEUE_STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'queue_state'))
+QUEUE_CHECKPOINT_SECONDS = 60
 
 db = SQLAlchemy(app)
 
+# How often an idle /api/queue/stream connection gets a keep-alive message.
+STREAM_KEEPALIVE_SECONDS = 15
+# How many times a registration retries a queue number that lost a race or hit a lock timeout.
+QUEUE_NUMBER_RETRIES = 5
+# How long /api/analytics trusts its totals for earlier days. Changes made in this process
+# drop them at once; this bounds how long one made elsewhere (another worker,
+# `flask rebuild-stats`) can go unseen.
+PAST_STATS_MAX_AGE_SECONDS = 60
+
 # --- Database Model ---
 # This class defines the 'customers' table in MySQL. 
 class Customer(db.Model):
     __tablename__ = 'customers'
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    queue_number = db.Column(db.String(10), nullable=False, unique=True)
+    # A compact auto-increment key: new rows append to the end of the primary key
+    # instead of landing at random like UUIDs, and every secondary index stays small.
+    # (SQLite only auto-increments a plain INTEGER primary key, hence the variant.)
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    queue_number = db.Column(db.String(10), nullable=False)
+    queue_date = db.Column(db.Date, nullable=False, default=datetime.date.today) # queue numbers restart every day
     name = db.Column(db.String(100), nullable=False)
     category = db.Column(db.String(50), nullable=False)
     service = db.Column(db.Text, nullable=True) # Text type for multiple services
@@ -36,82 +84,552 @@ class Customer(db.Model):
     status = db.Column(db.String(20), nullable=False, default='waiting')
     arrival_timestamp = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
     completion_timestamp = db.Column(db.DateTime, nullable=True)
+    counter_id = db.Column(db.Integer, nullable=True) # which window called them
+    service_start_timestamp = db.Column(db.DateTime, nullable=True) # when they were called to the window
+
+    __table_args__ = (
+        db.UniqueConstraint('queue_date', 'queue_number', name='uq_customers_queue_date_number'),
+        # The hot queries all filter on status first:
+        db.Index('ix_customers_status_arrival', 'status', 'arrival_timestamp'),   # waiting line in arrival order, who is serving
+        db.Index('ix_customers_completion', 'completion_timestamp'),              # recent completions, rollup rebuilds by period
+        {'extend_existing': True}
+    )
+
+# A service window. `services` is comma-joined like Customer.service; a window
+# with no services listed handles everything.
+class ServiceCounter(db.Model):
+    __tablename__ = 'service_counters'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    services = db.Column(db.Text, nullable=True)
 
     __table_args__ = {'extend_existing': True}
 
-# --- The In-Memory Priority Queue ---
-class PriorityQueue:
-    def __init__(self):
-        self._queue = []
-        self._lock = threading.Lock() # Prevents issues if multiple requests come at once
+# One row per queue number prefix per day, holding the last number handed out.
+class QueueCounter(db.Model):
+    __tablename__ = 'queue_counters'
+    prefix = db.Column(db.String(5), primary_key=True)
+    queue_date = db.Column(db.Date, primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False)
 
-    def push(self, customer_obj):
-        # We must calculate the score before adding the customer to the heap
-        score, _ = get_dynamic_score(customer_obj)
-        with self._lock:
-            # heapq is a min-heap, so we use negative score to find the max score.
-            # We also add arrival_timestamp as a tie-breaker.
-            heapq.heappush(self._queue, (-score, customer_obj.arrival_timestamp, customer_obj.id))
+    __table_args__ = {'extend_existing': True}
 
-    def pop(self):
-        with self._lock:
-            while self._queue:
-                # Get the item with the highest priority (lowest negative number)
-                _neg_score, _arrival, customer_id = heapq.heappop(self._queue)
-                
-                # Because scores change with time, we must re-validate before returning.
-                customer = Customer.query.get(customer_id)
-                if customer and customer.status == 'waiting':
-                    # Recalculate the score with the current time
-                    current_score, _ = get_dynamic_score(customer)
-                    
-                    # If the popped score is still the highest, we have our winner.
-                    if -_neg_score >= current_score - 1: # Allow for small timing variations
-                        return customer
-                    else:
-                        # The score changed and this person is no longer highest priority.
-                        # Put them back in the heap with their new score and try again.
-                        self.push(customer)
-            return None # The queue is empty
-
-    def get_all_item_ids(self):
-        # Returns a list of all customer IDs currently in the heap.
-        with self._lock:
-            return [customer_id for _, _, customer_id in self._queue]
+# Running totals per day, category and urgency, kept up to date as customers
+# arrive and are served, so analytics never has to scan the customers table.
+class DailyServiceStats(db.Model):
+    __tablename__ = 'daily_service_stats'
+    stats_date = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    urgency = db.Column(db.Integer, primary_key=True)
+    arrived_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    total_wait_seconds = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = {'extend_existing': True}
+
+# What "now" means to the app. The load test swaps in a simulated clock (see use_clock)
+# so a whole day of arrivals and aging can be played through in seconds.
+clock = datetime.datetime.now
 
 # A single, global instance of our Priority Queue that the whole app will use.
 live_priority_queue = PriorityQueue()
 
+def use_clock(new_clock):
+    global clock
+    clock = new_clock
+    live_priority_queue.clock = new_clock
+
 # --- Core Logic & Algorithms ---
 
 def calculate_priority_score(customer_data):
-    score = 0
-    category_points = {"PWD": 5, "Senior Citizen": 4, "Pregnant": 4, "Regular": 1}
-    score += category_points.get(customer_data.get("customerCategory", "Regular"), 1)
-    score += (customer_data.get("customUrgencyLevel", 1) * 2)
-    if customer_data.get("hasAppointment", False):
-        score += 2
-    return score
+    # The weights live in queue_engine (SCORE_WEIGHTS), so the simulator scores people the same way.
+    return initial_priority_score(customer_data.get("customerCategory", "Regular"),
+                                  customer_data.get("customUrgencyLevel", 1),
+                                  customer_data.get("hasAppointment", False))
 
 def get_dynamic_score(customer):
-    now = datetime.datetime.now()
-    wait_time_minutes = int((now - customer.arrival_timestamp).total_seconds() / 60)
-    dynamic_score = customer.initial_priority_score
-    if wait_time_minutes >= 30: dynamic_score += 5
-    elif wait_time_minutes >= 20: dynamic_score += 3
-    elif wait_time_minutes >= 10: dynamic_score += 1
-    if customer.category == "Regular" and wait_time_minutes >= 25:
-         dynamic_score += 3
+    # The aging rules themselves live in queue_engine so the live queue and
+    # every display use exactly the same numbers.
+    now = clock()
+    wait_time_minutes = wait_minutes_at(customer.arrival_timestamp, now)
+    dynamic_score = customer.initial_priority_score + aging_bonus(customer.category, wait_time_minutes)
     return dynamic_score, wait_time_minutes
 
-def quick_sort(arr):
-    if len(arr) <= 1: return arr
+def priority_level(score):
+    return "High" if score >= 12 else "Medium" if score >= 8 else "Low"
+
+# --- Cached Queue Snapshot ---
+# Polls used to reload every waiting customer and re-sort them. Now the queue
+# keeps its own display order and a version number, and we only re-render the
+# JSON payload when that version (or a window's serving card) changes.
+
+def serving_card(record, score, counter):
+    # The 'now serving' card for a window. `record` can be a Customer or a queue entry,
+    # `counter` is the window as returned by queue_state.counter().
+    return { "queueNumber": record.queue_number, "fullName": record.name, "service": record.service,
+             "category": record.category, "score": score, "counterId": counter["id"], "counterName": counter["name"] }
+
+class CounterState:
+    # One service window: what it handles and who it is serving.
+    def __init__(self, counter_id, name, services):
+        self.id = counter_id
+        self.name = name
+        self.services = services
+        self.serving_id = None
+        self.serving_since = None  # when the customer being served was called
+        self.card = None
+
+    def to_json(self):
+        return {"id": self.id, "name": self.name, "services": list(self.services), "serving": self.card}
+
+class CounterBoard:
+    # Every window and who it is serving, kept in memory so polls don't need a query.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self.latest_card = None  # the most recent call, for boards that only show one
+        self.version = 0
+
+    def load(self, counters):
+        with self._lock:
+            self._counters = {c.id: CounterState(c.id, c.name, parse_services(c.services)) for c in counters}
+            self.version += 1
+
+    def get(self, counter_id=None):
+        # No id means the first window, which is what single-window setups use.
+        with self._lock:
+            if counter_id is None:
+                return self._counters[min(self._counters)] if self._counters else None
+            return self._counters.get(counter_id)
+
+    def all(self):
+        with self._lock:
+            return [self._counters[counter_id] for counter_id in sorted(self._counters)]
+
+    def set_serving(self, counter_id, customer_id, card, at=None):
+        # `at` is when the window made the change. Returns how many seconds the customer
+        # it replaces spent at the window, when we know when they were called.
+        finished_seconds = None
+        with self._lock:
+            counter = self._counters[counter_id]
+            if counter.serving_id is not None and counter.serving_since is not None and at is not None:
+                finished_seconds = (at - counter.serving_since).total_seconds()
+            counter.serving_id = customer_id
+            counter.serving_since = at if customer_id is not None else None
+            counter.card = card
+            if card is not None:
+                self.latest_card = card
+            elif self.latest_card is not None and self.latest_card["counterId"] == counter.id:
+                self.latest_card = None
+            self.version += 1
+        queue_broadcaster.publish('serving', json.dumps(counter.to_json()))
+        return finished_seconds
+
+def render_queue_row(entry):
+    # A customer's row only changes when their score does, so we keep the encoded
+    # JSON on the queue entry itself (the queue clears it when they age).
+    row = entry.display_cache
+    if row is None:
+        row = json.dumps({
+            "id": entry.id, "queueNumber": entry.queue_number, "name": entry.name,
+            "category": entry.category, "service": entry.service, "urgency": entry.urgency,
+            "priority": {"score": entry.score, "level": priority_level(entry.score)},
+            "arrivalTimestamp": entry.arrival_timestamp.isoformat(),
+            "alert": anti_starvation_alert(entry)
+        })
+        entry.display_cache = row
+    return row
+
+def anti_starvation_alert(entry):
+    # Regular customers who have passed an aging step (10/20/30 minutes) get an alert.
+    reached = [minutes for minutes, _ in AGING_STEPS if minutes not in entry.pending_marks]
+    if entry.category != "Regular" or not reached:
+        return None
+    step = max(reached)
+    bonus = dict(AGING_STEPS)[step]
+    return {"message": f"{entry.name} (Regular) - {step}+ Minute Wait (+{bonus} Aging Bonus)"}
+
+class QueueSnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boot_id = uuid.uuid4().hex[:8]  # so ETags from before a restart never match
+        self._key = None
+        self._body = None
+        self._etag = None
+
+    def get(self):
+        # Returns (json body, etag), re-rendering only if something changed since last time.
+        live_priority_queue.advance()
+        key = (live_priority_queue.version, counter_board.version)
+        if key == self._key:
+            return self._body, self._etag
+        with self._lock:
+            if key != self._key:
+                render_started = time.perf_counter()
+                serving_version = counter_board.version
+                serving_card = counter_board.latest_card
+                counters = [counter.to_json() for counter in counter_board.all()]
+                order_started = time.perf_counter()
+                version, entries = live_priority_queue.ordered_entries()
+                queue_order_seconds.observe(time.perf_counter() - order_started)
+                alerts = [alert for alert in map(anti_starvation_alert, entries) if alert]
+                self._body = ''.join([
+                    '{"currentlyServing":', json.dumps(serving_card), ',"counters":', json.dumps(counters),
+                    ',"queue":[', ','.join(map(render_queue_row, entries)),
+                    '],"antiStarvationAlerts":', json.dumps(alerts), '}'
+                ])
+                self._key = (version, serving_version)
+                self._etag = f"{self._boot_id}-{version}-{serving_version}"
+                queue_snapshot_seconds.observe(time.perf_counter() - render_started)
+            return self._body, self._etag
+
+# --- Live Updates ---
+# Display boards can subscribe to /api/queue/stream instead of polling. They get
+# one snapshot, then a small event for every change to the queue.
+
+def publish_queue_change(change, entry):
+    # Called by the live queue (while it is locked) for every add, removal and aging step.
+    if change == 'remove':
+        queue_broadcaster.publish('remove', json.dumps({"id": entry.id}))
     else:
-        pivot = arr[len(arr) // 2]
-        left = [x for x in arr if x['priority']['score'] > pivot['priority']['score']]
-        middle = [x for x in arr if x['priority']['score'] == pivot['priority']['score']]
-        right = [x for x in arr if x['priority']['score'] < pivot['priority']['score']]
-        return quick_sort(left) + middle + quick_sort(right)
+        queue_broadcaster.publish('add' if change == 'add' else 'priority', render_queue_row(entry))
+    if change == 'add':
+        aging_timer.wake()
+
+class AgingTimer:
+    # Scores only change at known moments, so instead of ticking we sleep until the
+    # next aging mark is due, apply it (which publishes the 'priority' events) and repeat.
+    MAX_SLEEP_SECONDS = 60
+
+    def __init__(self, queue):
+        self._queue = queue
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='aging-timer', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        # Someone new joined; their first mark may be sooner than the one we're waiting for.
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            due = self._queue.next_aging_time()
+            timeout = self.MAX_SLEEP_SECONDS
+            if due is not None:
+                timeout = min(timeout, max(0.0, (due - clock()).total_seconds()))
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            self._queue.advance()
+
+queue_broadcaster = QueueBroadcaster()
+counter_board = CounterBoard()
+queue_snapshot = QueueSnapshot()
+aging_timer = AgingTimer(live_priority_queue)
+queue_journal = QueueJournal(QUEUE_STATE_DIR)
+service_times = ServiceTimes()  # recent times at the window, for wait estimates
+live_priority_queue.add_listener(publish_queue_change)
+live_priority_queue.add_listener(queue_journal.record)
+
+# --- Metrics ---
+# Two sets, both returned by /api/metrics: what this process did (requests, SQL,
+# serves), and the live queue's own numbers, which come from whichever process
+# owns the queue (the queue server, when running under gunicorn).
+metrics = MetricsRegistry()
+queue_metrics = MetricsRegistry()
+
+request_seconds = metrics.histogram(
+    'ayospila_http_request_seconds', "Time to build each response.", ('endpoint', 'method', 'status'))
+sql_statement_seconds = metrics.histogram(
+    'ayospila_sql_statement_seconds', "Time spent in each SQL statement, by kind.", ('statement',))
+sql_statements_per_request = metrics.histogram(
+    'ayospila_sql_statements_per_request', "Database round trips made by each request.", ('endpoint',),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50))
+serve_pops = metrics.histogram(
+    'ayospila_serve_pops', "Queue pops per serve-next; more than one means a popped customer was no longer waiting.",
+    buckets=(1, 2, 3, 5, 10))
+serve_requeued = metrics.counter(
+    'ayospila_serve_requeued_total', "Customers put back in the queue because their serve-next failed to commit.")
+
+def database_connections_in_use():
+    checked_out = getattr(db.engine.pool, 'checkedout', None)
+    return checked_out() if checked_out else 0
+
+metrics.gauge('ayospila_db_connections_in_use', "Connections checked out of the database pool.",
+              function=database_connections_in_use)
+
+queue_changes = queue_metrics.counter(
+    'ayospila_queue_changes_total', "Changes to the live queue. Every rescore pushes the customer into their lanes again.",
+    ('change',))
+queue_order_seconds = queue_metrics.histogram(
+    'ayospila_queue_order_seconds', "Time to bring the display order up to date for a new snapshot.")
+queue_snapshot_seconds = queue_metrics.histogram(
+    'ayospila_queue_snapshot_render_seconds', "Time to render a new /api/queue snapshot, ordering included.")
+queue_restore_seconds = queue_metrics.gauge(
+    'ayospila_queue_restore_seconds', "How long start-up took to restore the live queue.")
+queue_restore_corrected = queue_metrics.gauge(
+    'ayospila_queue_restore_corrected', "Customers the start-up check against the database added to or removed from the restored queue.")
+queue_repaired = queue_metrics.counter(
+    'ayospila_queue_repaired_total', "Customers the periodic check against the database added to or removed from the live queue.")
+
+def queue_stat(name):
+    return lambda: live_priority_queue.stats()[name]
+
+queue_metrics.gauge('ayospila_queue_waiting', "Customers waiting in the live queue.", function=queue_stat('waiting'))
+queue_metrics.gauge('ayospila_queue_lane_heap_items', "Items in the service lane heaps, including ones left behind by serves and rescores.",
+                    function=queue_stat('lane_heap_items'))
+queue_metrics.gauge('ayospila_queue_live_lane_items', "Lane heap items that belong to waiting customers.",
+                    function=queue_stat('live_lane_items'))
+queue_metrics.gauge('ayospila_queue_aging_events', "Aging marks scheduled.", function=queue_stat('aging_events'))
+queue_metrics.counter('ayospila_queue_lock_acquired_total', "Times the queue lock was taken.",
+                      function=queue_stat('lock_acquired'))
+queue_metrics.counter('ayospila_queue_lock_contended_total', "Times the queue lock was taken only after waiting for it.",
+                      function=queue_stat('lock_contended'))
+queue_metrics.counter('ayospila_queue_lock_wait_seconds_total', "Time spent waiting for the queue lock.",
+                      function=queue_stat('lock_wait_seconds'))
+queue_metrics.gauge('ayospila_service_seconds_mean', "Mean time at the window over the latest services, used for wait estimates.",
+                    function=service_times.mean)
+
+def count_queue_change(change, entry):
+    queue_changes.inc(labels=(change,))
+
+live_priority_queue.add_listener(count_queue_change)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.sql_statements = 0
+
+@app.after_request
+def record_request_time(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'  # a URL no route answers
+        request_seconds.observe(time.perf_counter() - started, (endpoint, request.method, str(response.status_code)))
+        sql_statements_per_request.observe(g.sql_statements, (endpoint,))
+    return response
+
+# A connection runs one statement at a time, so one start time per connection is enough.
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['statement_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_statement_time(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('statement_started', None)
+    if started is not None:
+        sql_statement_seconds.observe(time.perf_counter() - started, (statement.split(None, 1)[0].upper(),))
+    if has_request_context():
+        g.sql_statements = g.get('sql_statements', 0) + 1
+
+class LocalQueueState:
+    """
+    Everything the endpoints ask of the live queue, when this process owns it
+    (`python app.py`, or the queue server behind a multi-worker deployment).
+    Workers use a RemoteQueueState with the same methods instead, so the
+    endpoints don't care which one they have. Arguments and results are plain
+    data, since they may have to travel between processes.
+    """
+
+    def push(self, record):
+        live_priority_queue.push(record)
+
+    def pop(self, services):
+        return live_priority_queue.pop(services=services)
+
+    def snapshot(self, known_etag=None):
+        # (body, etag), or None when the caller already has this version.
+        body, etag = queue_snapshot.get()
+        return None if etag == known_etag else (body, etag)
+
+    def counter(self, counter_id=None):
+        counter = counter_board.get(counter_id)
+        return counter.to_json() if counter else None
+
+    def counters(self):
+        return [counter.to_json() for counter in counter_board.all()]
+
+    def set_serving(self, counter_id, customer_id, card, at=None):
+        finished_seconds = counter_board.set_serving(counter_id, customer_id, card, at)
+        if finished_seconds is not None and finished_seconds >= 0:
+            service_times.add(finished_seconds)
+
+    def predict_wait(self, customer_id, service):
+        # Estimated seconds until this waiting customer is called (None if no window handles their service).
+        counters = counter_board.all()
+        windows = [counter.services for counter in counters]
+        idle = {index for index, counter in enumerate(counters) if counter.serving_id is None}
+        return predict_wait_seconds(live_priority_queue, customer_id, service, windows, service_times, idle=idle)
+
+    def queue_length(self):
+        return len(live_priority_queue)
+
+    def metrics_text(self):
+        return queue_metrics.render()
+
+# Swapped for a RemoteQueueState by use_queue_server() when running as one of several workers.
+queue_state = LocalQueueState()
+queue_relay = None
+# One serve at a time per window within this process; the row lock in serve-next covers other processes.
+serve_locks = collections.defaultdict(threading.Lock)
+
+def use_queue_server():
+    """
+    Makes this process a worker: the live queue is owned by the queue server
+    (queue_server.py) and reached over a local socket, and queue changes are
+    relayed from it to this worker's display board connections.
+    """
+    global queue_state, queue_relay, queue_initialized
+    address, authkey = queue_server_address(QUEUE_STATE_DIR), queue_server_authkey()
+    queue_state = RemoteQueueState(address, authkey)
+    # Every worker keeps its own request and SQL metrics; the pid keeps their series apart.
+    metrics.const_labels["worker"] = str(os.getpid())
+    queue_relay = QueueRelay(address, authkey, queue_broadcaster)
+    queue_initialized = False
+
+def queue_record(customer):
+    # The fields the live queue keeps, as plain data that can be sent to the queue server.
+    return QueueRecord(customer.id, customer.queue_number, customer.name, customer.category, customer.service,
+                       customer.urgency, customer.initial_priority_score, customer.arrival_timestamp)
+
+def allocate_queue_number(category, queue_date):
+    """
+    Hands out the next queue number for this category's prefix today, e.g. "P-014".
+
+    Each number is one bump of a counter row keyed by (prefix, day), so it costs
+    the same no matter how big the customers table gets. The bump runs in its own
+    short transaction: the database locks just that row, so two registrations at
+    the same moment always get different numbers.
+    """
+    prefix = category[:1].upper()
+    counter = QueueCounter.__table__
+    this_counter = (counter.c.prefix == prefix) & (counter.c.queue_date == queue_date)
+    for _attempt in range(QUEUE_NUMBER_RETRIES):
+        try:
+            with db.engine.begin() as connection:
+                bumped = connection.execute(
+                    counter.update().where(this_counter).values(last_value=counter.c.last_value + 1))
+                if bumped.rowcount:
+                    value = connection.execute(db.select(counter.c.last_value).where(this_counter)).scalar_one()
+                else:
+                    # First registration for this prefix today.
+                    connection.execute(counter.insert().values(prefix=prefix, queue_date=queue_date, last_value=1))
+                    value = 1
+            return f"{prefix}-{value:03d}"
+        except (IntegrityError, OperationalError):
+            # Someone else created today's row first, or the database asked us to retry.
+            continue
+    raise RuntimeError(f"Could not allocate a queue number for prefix {prefix}")
+
+# --- Analytics Rollup ---
+# /api/analytics never reads the customers table. Registrations and completions
+# bump per-(day, category, urgency) totals in daily_service_stats as they happen,
+# and the endpoint adds those up: today's few rows on every call, and earlier
+# days through PastStatsCache, since those rows only change when someone from an
+# earlier day completes late or the rollup is rebuilt.
+
+def bump_daily_stats(customer, **increments):
+    """
+    Adds to the (day, category, urgency) totals for this customer inside the
+    current transaction, so the rollup commits (or rolls back) together with
+    the change to the customer.
+    """
+    stats = DailyServiceStats.__table__
+    key = {"stats_date": customer.queue_date, "category": customer.category, "urgency": customer.urgency or 1}
+    this_row = (stats.c.stats_date == key["stats_date"]) & (stats.c.category == key["category"]) & (stats.c.urgency == key["urgency"])
+    bump = stats.update().where(this_row).values({stats.c[column]: stats.c[column] + amount
+                                                  for column, amount in increments.items()})
+    if key["stats_date"] != clock().date():
+        # Drop the cached totals once this commits; dropping them now would let a
+        # concurrent read cache the totals from before the commit.
+        db.session.info['past_stats_changed'] = True
+    if db.session.execute(bump).rowcount:
+        return
+    # First customer in this group today. If another request creates the row at the
+    # same moment, the savepoint keeps our transaction alive and we just bump theirs.
+    try:
+        with db.session.begin_nested():
+            db.session.execute(stats.insert().values(**key, arrived_count=0, completed_count=0, total_wait_seconds=0))
+    except IntegrityError:
+        pass
+    db.session.execute(bump)
+
+def seconds_between(start, end):
+    # SQL expression for the number of seconds from start to end.
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(end) - func.julianday(start)) * 86400.0
+    return func.timestampdiff(db.text('SECOND'), start, end)
+
+def rebuild_daily_stats():
+    # Recomputes the whole rollup from the customers table with one grouped query.
+    # Only needed after importing old data or fixing records by hand.
+    completed = (Customer.status == 'completed') & Customer.completion_timestamp.isnot(None)
+    totals = db.select(
+        Customer.queue_date, Customer.category, func.coalesce(Customer.urgency, 1),
+        func.count(Customer.id),
+        func.sum(db.case((completed, 1), else_=0)),
+        func.sum(db.case((completed, seconds_between(Customer.arrival_timestamp, Customer.completion_timestamp)), else_=0))
+    ).group_by(Customer.queue_date, Customer.category, func.coalesce(Customer.urgency, 1))
+    stats = DailyServiceStats.__table__
+    db.session.execute(stats.delete())
+    db.session.execute(stats.insert().from_select(
+        ['stats_date', 'category', 'urgency', 'arrived_count', 'completed_count', 'total_wait_seconds'], totals))
+    db.session.commit()
+    past_stats_cache.invalidate()
+
+def daily_stats_totals(condition):
+    # (category, urgency, arrived, completed, wait seconds) summed over the matching days.
+    DSS = DailyServiceStats
+    return db.session.query(
+        DSS.category, DSS.urgency, func.sum(DSS.arrived_count), func.sum(DSS.completed_count), func.sum(DSS.total_wait_seconds)
+    ).filter(condition).group_by(DSS.category, DSS.urgency).all()
+
+class PastStatsCache:
+    # Totals for the days before today hardly ever change, so we add them up at most
+    # once a minute instead of on every /api/analytics call. That keeps the endpoint's
+    # cost flat as the months of history pile up.
+    def __init__(self, max_age=PAST_STATS_MAX_AGE_SECONDS):
+        self._lock = threading.Lock()
+        self._max_age = max_age
+        self._day = None
+        self._expires = 0.0
+        self._generation = 0   # bumped by invalidate(), so a read that overlaps one isn't kept
+        self._groups = []
+
+    def totals_before(self, today):
+        with self._lock:
+            if self._day == today and time.monotonic() < self._expires:
+                return list(self._groups)
+            generation = self._generation
+        groups = [tuple(row) for row in daily_stats_totals(DailyServiceStats.stats_date < today)]
+        with self._lock:
+            if self._generation == generation:
+                self._groups = groups
+                self._day = today
+                self._expires = time.monotonic() + self._max_age
+        return list(groups)
+
+    def invalidate(self):
+        # Someone from an earlier day was just completed (e.g. served after midnight).
+        with self._lock:
+            self._day = None
+            self._generation += 1
+
+past_stats_cache = PastStatsCache()
+
+@event.listens_for(Session, 'after_commit')
+def drop_past_stats_after_commit(session):
+    if session.info.pop('past_stats_changed', False):
+        past_stats_cache.invalidate()
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Rebuild the daily_service_stats rollup from the customers table."""
+    rebuild_daily_stats()
+    print("daily_service_stats rebuilt.")
 
 # --- API Endpoints ---
 
@@ -120,6 +638,7 @@ def add_customer():
     data = request.get_json()
     if not data or 'fullName' not in data or 'category' not in data:
         return jsonify({"error": "Missing required fields"}), 400
+    ensure_queue_initialized()
 
     # Process frontend data to match backend needs
     appointment_data = data.get('appointment', {})
@@ -133,186 +652,444 @@ def add_customer():
     }
     initial_score = calculate_priority_score(processed_data_for_scoring)
     
-    total_customers = db.session.query(func.count(Customer.id)).scalar()
-    queue_number_val = f"{data['category'][:1].upper()}-{total_customers + 1:03d}"
+    arrival_time = clock()
+    queue_number_val = allocate_queue_number(data['category'], arrival_time.date())
 
     # 1. Save the new customer to the MySQL database (permanent record).
     new_customer = Customer(
-        queue_number=queue_number_val, name=data["fullName"], category=data["category"],
-        service=services_string, urgency=data.get("urgency", 1),
-        has_appointment=has_appointment_bool, initial_priority_score=initial_score
+        queue_number=queue_number_val, queue_date=arrival_time.date(), name=data["fullName"],
+        category=data["category"], service=services_string, urgency=data.get("urgency", 1),
+        has_appointment=has_appointment_bool, initial_priority_score=initial_score,
+        arrival_timestamp=arrival_time
     )
     db.session.add(new_customer)
+    bump_daily_stats(new_customer, arrived_count=1)
     db.session.commit()
 
     # 2. Add the new customer to our live, in-memory Priority Queue.
-    live_priority_queue.push(new_customer)
-    
+    queue_state.push(queue_record(new_customer))
+
+    # 3. Estimate their wait from who is ahead of them and how fast the windows have been going.
+    # They are registered by now, so a failed estimate must not turn this into an error
+    # (the kiosk would tell them to register again).
+    try:
+        wait_seconds = queue_state.predict_wait(new_customer.id, new_customer.service)
+    except Exception:
+        app.logger.exception("Couldn't estimate the wait for customer %s", new_customer.id)
+        wait_seconds = None
+
     return jsonify({
         "success": True,
         "customer": { "queueNumber": new_customer.queue_number, "fullName": new_customer.name,
-                      "priorityScore": new_customer.initial_priority_score }
+                      "priorityScore": new_customer.initial_priority_score,
+                      "estimatedWaitMinutes": None if wait_seconds is None else round(wait_seconds / 60) }
     }), 201
 
 
-# In app.py, replace the old get_queue_status function with this one.
-
 @app.route('/api/queue', methods=['GET'])
 def get_queue_status():
-    currently_serving_customer = Customer.query.filter_by(status='serving').first()
-
-    # Check if the in-memory queue is empty
-    if not live_priority_queue.get_all_item_ids():
-        # If it's empty, check if there are actually people waiting in the database
-        waiting_in_db = Customer.query.filter_by(status='waiting').count()
-        if waiting_in_db > 0:
-            # If so, it means our in-memory heap is out of sync. Let's re-initialize it.
-            print("In-memory queue is empty but DB has waiting customers. Re-initializing...")
-            initialize_queue()
-    
-    # 1. Get the list of all customer IDs from our live in-memory heap.
-    all_waiting_ids = live_priority_queue.get_all_item_ids()
-    
-    # 2. Get the full customer objects from the database for these IDs.
-    # We use a dictionary for quick lookups.
-    customers_by_id = {str(c.id): c for c in Customer.query.filter(Customer.id.in_(all_waiting_ids)).all()}
+    ensure_queue_initialized()
 
-    # 3. Build the display list with fresh dynamic scores.
-    queue_for_display = []
-    alerts = []
-    
-    # We iterate through the IDs from the heap to maintain a semblance of heap order
-    for cust_id in all_waiting_ids:
-        customer = customers_by_id.get(cust_id)
-        if customer:
-            score, wait_time = get_dynamic_score(customer)
-            queue_for_display.append({
-                "id": customer.id, "queueNumber": customer.queue_number, "name": customer.name,
-                "category": customer.category, "service": customer.service, "urgency": customer.urgency,
-                "priority": {"score": score, "level": "High" if score >= 12 else "Medium" if score >= 8 else "Low"},
-                "waitTime": wait_time
-            })
-            if wait_time >= 10 and customer.category == "Regular":
-                bonus = 5 if wait_time >=30 else 3 if wait_time >= 20 else 1
-                alerts.append({"message": f"{customer.name} (Regular) - {wait_time} Minute Wait (+{bonus} Aging Bonus)"})
-
-    # 4. Use our QuickSort algorithm to sort the list for display.
-    sorted_queue = quick_sort(queue_for_display)
-
-    # Prepare the data for the 'currently serving' card
-    serving_response = None
-    if currently_serving_customer:
-        score, _ = get_dynamic_score(currently_serving_customer)
-        serving_response = { "queueNumber": currently_serving_customer.queue_number, "fullName": currently_serving_customer.name,
-                             "service": currently_serving_customer.service, "category": currently_serving_customer.category, "score": score }
-
-    return jsonify({ "currentlyServing": serving_response, "queue": sorted_queue, "antiStarvationAlerts": alerts })
+    # Every display board polls this endpoint, so we answer from the cached payload.
+    # Boards that already have the current version get an empty 304 back.
+    body, etag = queue_state.snapshot()
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # always revalidate, never serve stale
+    response = response.make_conditional(request)
+    # Wait times are worked out by the board from arrivalTimestamp, using our clock.
+    response.headers['X-Server-Time'] = clock().isoformat()
+    return response
+
+
+@app.route('/api/queue/stream', methods=['GET'])
+def stream_queue():
+    ensure_queue_initialized()
+
+    def clock_message():
+        return format_sse('clock', json.dumps({"serverTime": clock().isoformat()}))
+
+    def generate():
+        # Take the sequence number before the snapshot, so nothing can slip in between.
+        # Anything replayed twice is harmless: the board applies events by customer id.
+        sequence = queue_broadcaster.last_sequence
+        body, _etag = queue_state.snapshot()
+        yield format_sse('snapshot', body) + clock_message()
+        while True:
+            result = queue_broadcaster.wait_for_messages(sequence, timeout=STREAM_KEEPALIVE_SECONDS)
+            if result is None:
+                # This board fell too far behind; start it over from a fresh snapshot.
+                sequence = queue_broadcaster.last_sequence
+                body, _etag = queue_state.snapshot()
+                yield format_sse('snapshot', body)
+                continue
+            sequence, messages = result
+            # With no news, the clock event doubles as a keep-alive.
+            yield ''.join(messages) if messages else clock_message()
+
+    response = app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # stop proxies like nginx from holding events back
+    return response
 
 
 @app.route('/api/queue/serve-next', methods=['POST'])
 def serve_next_customer():
-    # Update the person who was previously being served to 'completed'
-    currently_serving = Customer.query.filter_by(status='serving').first()
-    if currently_serving:
-        currently_serving.status = 'completed'
-        currently_serving.completion_timestamp = datetime.datetime.now()
-
-    # Pop the highest-priority customer from our live in-memory heap (very fast).
-    next_customer_to_serve = live_priority_queue.pop()
-    
-    if next_customer_to_serve:
-        # Update their status to 'serving' in the permanent database.
-        next_customer_to_serve.status = 'serving'
-        db.session.commit()
-        return jsonify({"success": True, "nowServing": {"queueNumber": next_customer_to_serve.queue_number, "fullName": next_customer_to_serve.name}})
+    ensure_queue_initialized()
+    data = request.get_json(silent=True) or {}
+    counter = queue_state.counter(data.get('counterId'))
+    if counter is None:
+        return jsonify({"error": "Unknown counter"}), 404
+
+    # Each window serves one customer at a time, but windows don't wait on each other:
+    # the only thing they share is the queue's quick in-memory claim.
+    with serve_locks[counter["id"]]:
+        now = clock()
+        popped = []  # whoever we took out of the live queue, until the commit makes it stick
+        try:
+            # Lock this window's row until we commit, so two workers can't serve for the same window
+            # at once. A no-op UPDATE rather than SELECT ... FOR UPDATE, because SQLite ignores
+            # FOR UPDATE but does take its write lock for an UPDATE.
+            counters_table = ServiceCounter.__table__
+            db.session.execute(counters_table.update().where(counters_table.c.id == counter["id"])
+                               .values(id=counters_table.c.id))
+            # Update the person this window was serving to 'completed'
+            for finished in Customer.query.filter_by(status='serving', counter_id=counter["id"]).all():
+                finished.status = 'completed'
+                finished.completion_timestamp = now
+                wait_seconds = (now - finished.arrival_timestamp).total_seconds()
+                bump_daily_stats(finished, completed_count=1, total_wait_seconds=wait_seconds)
+
+            next_entry = claim_next_customer(counter, now, popped)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for entry in popped:
+                serve_requeued.inc()
+                queue_state.push(QueueRecord._make(entry_to_tuple(entry)))  # still waiting; put them back
+            raise
+        card = serving_card(next_entry, next_entry.score, counter) if next_entry else None
+        queue_state.set_serving(counter["id"], next_entry.id if next_entry else None, card, now)
+
+    if next_entry is None:
+        return jsonify({"success": True, "nowServing": None, "counterId": counter["id"]})
+    return jsonify({"success": True, "counterId": counter["id"],
+                    "nowServing": {"queueNumber": next_entry.queue_number, "fullName": next_entry.name}})
+
+def claim_next_customer(counter, now, popped):
+    # Pops the best customer this window can serve from the live queue (no DB reads)
+    # and marks them 'serving'. The status check in the UPDATE makes sure a customer
+    # is only ever called once, even if the queue and the database disagree.
+    # The entry being claimed is kept in `popped`, so the caller can put it back if
+    # the UPDATE or the commit fails.
+    pops = 0
+    try:
+        while True:
+            entry = queue_state.pop(tuple(counter["services"]))
+            pops += 1
+            if entry is None:
+                return None
+            popped.append(entry)
+            claimed = db.session.execute(
+                db.update(Customer)
+                .where(Customer.id == entry.id, Customer.status == 'waiting')
+                .values(status='serving', counter_id=counter["id"], service_start_timestamp=now)
+                .execution_options(synchronize_session=False))
+            if claimed.rowcount:
+                return entry
+            popped.remove(entry)  # no longer waiting in the database; nothing to put back
+    finally:
+        serve_pops.observe(pops)
+
+
+@app.route('/api/counters', methods=['GET'])
+def get_counters():
+    ensure_queue_initialized()
+    return jsonify({"counters": queue_state.counters()})
+
+
+@app.cli.command('add-counter')
+@click.argument('name')
+@click.option('--service', 'services', multiple=True, help='A service this window handles (repeatable). None means all.')
+def add_counter_command(name, services):
+    """Add a service window. Restart the app to pick it up."""
+    counter = ServiceCounter(name=name, services=", ".join(services) or None)
+    db.session.add(counter)
+    db.session.commit()
+    print(f"Added counter {counter.id}: {name} ({counter.services or 'all services'})")
+
+
+def load_history(day):
+    # That day's customers, to replay in the simulator. Anyone without a recorded time at
+    # the window (never served, or served before we kept it) gets the day's average.
+    rows = db.session.execute(db.select(
+        Customer.id, Customer.category, Customer.service, Customer.urgency, Customer.has_appointment,
+        Customer.arrival_timestamp, Customer.service_start_timestamp, Customer.completion_timestamp
+    ).where(Customer.queue_date == day)).all()
+    durations = {row.id: (row.completion_timestamp - row.service_start_timestamp).total_seconds()
+                 for row in rows if row.service_start_timestamp and row.completion_timestamp}
+    average = sum(durations.values()) / len(durations) if durations else DEFAULT_SERVICE_SECONDS
+    return [SimulatedCustomer(row.id, row.category, row.service, row.urgency or 1, bool(row.has_appointment),
+                              row.arrival_timestamp, durations.get(row.id, average)) for row in rows]
+
+def history_windows(day):
+    # The services of each window that called someone that day (or of every window, if none did).
+    served_by = db.select(Customer.counter_id).where(Customer.queue_date == day, Customer.counter_id.isnot(None))
+    counters = ServiceCounter.query.filter(ServiceCounter.id.in_(served_by)).all() or ServiceCounter.query.all()
+    return [parse_services(counter.services) for counter in counters]
+
+@app.cli.command('simulate')
+@click.option('--date', 'day', type=click.DateTime(formats=['%Y-%m-%d']),
+              help="Replay this day from the customers table (default: yesterday).")
+@click.option('--synthetic', type=int, help="Simulate this many generated arrivals over 8 hours instead.")
+@click.option('--windows', type=int, help="Use this many windows that handle everything, instead of the real ones.")
+@click.option('--aging', help='Aging steps to try, as minutes:points, e.g. "40:6,20:3,10:1".')
+@click.option('--regular-aging', help='The extra boost for Regular customers to try, as minutes:points, e.g. "25:3".')
+@click.option('--weights', help='Scoring weights to try, e.g. "PWD=6,Senior Citizen=4,urgency=3,appointment=2".')
+@click.option('--seed', type=int, default=1, help="Random seed for --synthetic.")
+def simulate_command(day, synthetic, windows, aging, regular_aging, weights, seed):
+    """Compare simulated waits under the current scoring and under new weights or aging rules."""
+    if synthetic:
+        customers = synthetic_day(random.Random(seed), synthetic)
+        source = f"{synthetic} synthetic arrivals"
+        window_services = [()] * (windows or 6)
     else:
-        # If the heap was empty, we still need to save the change for the person who was completed.
-        db.session.commit()
-        return jsonify({"success": True, "nowServing": None})
+        day = day.date() if day else clock().date() - datetime.timedelta(days=1)
+        customers = load_history(day)
+        source = f"{day}: {len(customers)} customers"
+        window_services = [()] * windows if windows else history_windows(day)
+    if not customers or not window_services:
+        print(f"Nothing to simulate ({source}, {len(window_services)} windows).")
+        return
+    started = time.perf_counter()
+    current = simulate(customers, window_services, predict=True)
+    proposed = simulate(customers, window_services, parse_weights(weights), parse_aging(aging, regular_aging))
+    elapsed = time.perf_counter() - started
+
+    print(f"{source}, {len(window_services)} windows (simulated twice in {elapsed * 1e3:.0f} ms)")
+    print(f"{'waits in minutes':<16}{'current rules':>34}{'proposed':>34}")
+    print(f"{'group':<16}" + f"{'n':>6}{'mean':>7}{'p50':>7}{'p90':>7}{'max':>7}" * 2)
+    for before, after in zip(current.summary(), proposed.summary()):
+        print(f"{before[0]:<16}" + "".join(f"{row[1]:>6}{row[2]:>7.1f}{row[3]:>7.1f}{row[4]:>7.1f}{row[5]:>7.1f}"
+                                           for row in (before, after)))
+    error = current.prediction_error()
+    if error:
+        print(f"Wait estimates at registration (current rules): off by {error[0]:.1f} min on average, "
+              f"{error[1]:+.1f} min bias")
 
 
 @app.route('/api/analytics', methods=['GET'])
 def get_analytics():
-    # Use database queries to efficiently calculate statistics.
-    total_customers = db.session.query(func.count(Customer.id)).scalar()
-    current_queue_length = Customer.query.filter_by(status='waiting').count()
-    completed_customers = Customer.query.filter_by(status='completed').all()
-
-    # Calculate overall average wait time
-    total_wait_time = 0
-    for cust in completed_customers:
-        if cust.completion_timestamp:
-            total_wait_time += (cust.completion_timestamp - cust.arrival_timestamp).total_seconds() / 60
-    avg_wait_time = (total_wait_time / len(completed_customers)) if completed_customers else 0
-
-    # Create lists to hold the wait times for each category
-    pwd_wait_times = []
-    senior_wait_times = []
-    pregnant_wait_times = []
-    emergency_wait_times = []
-    
-    # Loop through completed customers to gather their wait times by category
-    for cust in completed_customers:
-        if cust.completion_timestamp:
-            wait_minutes = (cust.completion_timestamp - cust.arrival_timestamp).total_seconds() / 60
-            if cust.category == 'PWD':
-                pwd_wait_times.append(wait_minutes)
-            elif cust.category == 'Senior Citizen':
-                senior_wait_times.append(wait_minutes)
-            elif cust.category == 'Pregnant':
-                pregnant_wait_times.append(wait_minutes)
-
-            if cust.urgency == 5:
-                emergency_wait_times.append(wait_minutes)
-
-    # Helper function to safely calculate the average, avoiding division by zero
-    def calculate_avg(times_list):
-        return sum(times_list) / len(times_list) if times_list else 0
-
-    # Calculate the average for each category
-    avg_pwd_wait = calculate_avg(pwd_wait_times)
-    avg_senior_wait = calculate_avg(senior_wait_times)
-    avg_pregnant_wait = calculate_avg(pregnant_wait_times)
-    avg_emergency_wait = calculate_avg(emergency_wait_times)
+    ensure_queue_initialized()
+    # Everything comes from the daily rollup (see "Analytics Rollup" above).
+    today = clock().date()
+    groups = past_stats_cache.totals_before(today) + daily_stats_totals(DailyServiceStats.stats_date == today)
+
+    total_customers = 0
+    completed = {"all": 0, "priority": 0, "PWD": 0, "Senior Citizen": 0, "Pregnant": 0, "emergency": 0}
+    wait_seconds = dict.fromkeys(completed, 0.0)
+
+    def add_group(name, count, seconds):
+        completed[name] += count
+        wait_seconds[name] += seconds
+
+    for category, urgency, arrived, done, waited in groups:
+        done, waited = int(done or 0), float(waited or 0)
+        total_customers += int(arrived or 0)
+        add_group("all", done, waited)
+        if category != 'Regular':
+            add_group("priority", done, waited)
+        if category in ('PWD', 'Senior Citizen', 'Pregnant'):
+            add_group(category, done, waited)
+        if urgency == 5:
+            add_group("emergency", done, waited)
+
+    # Helper function to safely calculate the average in minutes, avoiding division by zero
+    def average_minutes(name):
+        return round(wait_seconds[name] / completed[name] / 60) if completed[name] else 0
 
     # Package ALL the stats and send them back.
     return jsonify({
         "ltoServiceAnalytics": {
             "totalCustomersToday": total_customers,
-            "averageWaitTime": round(avg_wait_time),
-            "priorityCustomersServed": Customer.query.filter(Customer.status=='completed', Customer.category!='Regular').count(),
-            "currentQueueLength": current_queue_length
+            "averageWaitTime": average_minutes("all"),
+            "priorityCustomersServed": completed["priority"],
+            "currentQueueLength": queue_state.queue_length()
         },
         "fairnessMetrics": {
-            "pwdAverageWaitTime": round(avg_pwd_wait),
-            "seniorCitizenAverageWaitTime": round(avg_senior_wait),
-            "pregnantAverageWaitTime": round(avg_pregnant_wait),
-            "emergencyResponseTime": round(avg_emergency_wait)
+            "pwdAverageWaitTime": average_minutes("PWD"),
+            "seniorCitizenAverageWaitTime": average_minutes("Senior Citizen"),
+            "pregnantAverageWaitTime": average_minutes("Pregnant"),
+            "emergencyResponseTime": average_minutes("emergency")
         }
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text format. Under gunicorn each scrape reaches one worker, which
+    # answers with its own request metrics plus the queue server's queue metrics.
+    ensure_queue_initialized()
+    body = metrics.render() + queue_state.metrics_text()
+    return app.response_class(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # --- Final Setup and Execution ---
 
+# Just the columns the live queue needs, so start-up reads plain rows instead of building ORM objects.
+QUEUE_COLUMNS = (Customer.id, Customer.queue_number, Customer.name, Customer.category, Customer.service,
+                 Customer.urgency, Customer.initial_priority_score, Customer.arrival_timestamp)
+
+def load_waiting_rows(*conditions):
+    return db.session.execute(
+        db.select(*QUEUE_COLUMNS).where(Customer.status == 'waiting', *conditions)).all()
+
+def reconcile_waiting_customers(missing_before=None):
+    """
+    Makes the live queue agree with the customers the database says are waiting,
+    and returns (customers corrected, ids still missing from the queue). Only ids
+    are read, which the (status, arrival_timestamp) index answers on its own.
+
+    Start-up runs it on the restored queue, which can be missing the last few
+    changes (say, a crash right after a commit). The checkpointer runs it every
+    interval too, because a running queue can lose someone: a worker that dies
+    between popping a customer and committing the claim, or that commits a
+    registration and then fails to push it. Those checks pass `missing_before`,
+    the ids still missing last time, and only those are put back, so someone
+    who is only missing for a moment (popped, claim not committed yet) is
+    left alone. A dropped customer is back in line within two intervals.
+    """
+    # The queue is read first: anyone pushed after that is already committed as
+    # waiting, so at worst they are pushed again, which only replaces their entry.
+    queued_ids = set(live_priority_queue.get_all_item_ids())
+    waiting_ids = set(db.session.execute(db.select(Customer.id).where(Customer.status == 'waiting')).scalars())
+    stale_ids = queued_ids - waiting_ids
+    for customer_id in stale_ids:
+        live_priority_queue.remove(customer_id)
+    missing_ids = waiting_ids - queued_ids
+    readd_ids = list(missing_ids if missing_before is None else missing_ids & missing_before)
+    for offset in range(0, len(readd_ids), 500):
+        for row in load_waiting_rows(Customer.id.in_(readd_ids[offset:offset + 500])):
+            live_priority_queue.push(row)
+    return len(stale_ids) + len(readd_ids), missing_ids.difference(readd_ids)
+
+queue_missing_ids = set()   # waiting customers the last periodic check didn't find in the queue
+
+def repair_live_queue():
+    # Checkpointer hook, in the process that owns the queue. A database that is
+    # briefly unreachable just means the check is tried again next interval.
+    global queue_missing_ids
+    try:
+        with app.app_context():
+            fixed, queue_missing_ids = reconcile_waiting_customers(queue_missing_ids)
+    except Exception:
+        app.logger.exception("Couldn't check the live queue against the database")
+        return
+    if fixed:
+        queue_repaired.inc(fixed)
+        print(f"Corrected {fixed} customers in the live queue from the database.")
+
+queue_checkpointer = QueueCheckpointer(queue_journal, live_priority_queue, QUEUE_CHECKPOINT_SECONDS,
+                                       reconcile=repair_live_queue)
+
 def initialize_queue():
     """
     This function runs once when the server starts to populate our in-memory
-    Priority Queue from the permanent database. This ensures that if the server
-    crashed, the queue is restored on restart.
+    Priority Queue. It restores the last checkpoint from disk (checked against
+    the database), and only reads every waiting customer from the database
+    when there is no checkpoint. This ensures that if the server crashed, the
+    queue is restored on restart.
     """
+    global queue_initialized
+    if queue_relay is not None:
+        # A worker: the queue server has the queue; we only need its change feed.
+        queue_relay.start()
+        queue_initialized = True
+        return
     with app.app_context():
-        print("Initializing live queue from database...")
-        waiting_customers = Customer.query.filter(Customer.status == 'waiting').all()
-        for customer in waiting_customers:
-            live_priority_queue.push(customer)
-        print(f"Queue initialized with {len(waiting_customers)} waiting customers.")
+        print("Initializing live queue...")
+        started = time.perf_counter()
+        # Everything restored here stays alive, so garbage collection passes halfway
+        # through would only slow the restore down.
+        gc.disable()
+        try:
+            try:
+                records = queue_journal.restore()
+            except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+                print(f"Couldn't read the saved queue ({e}); loading it from the database instead.")
+                records = None
+            queue_journal.start_log()
+            if records is not None:
+                live_priority_queue.load(records)
+                fixed, _ = reconcile_waiting_customers()
+                queue_restore_corrected.set(fixed)
+                source = f"checkpoint ({fixed} corrected from the database)"
+            else:
+                live_priority_queue.load(load_waiting_rows())
+                source = "database"
+        finally:
+            gc.enable()
+        load_counters()
+        load_service_times()
+        queue_checkpointer.start()
+        atexit.register(queue_checkpointer.stop)
+        queue_initialized = True
+        aging_timer.start()
+        elapsed = time.perf_counter() - started
+        queue_restore_seconds.set(elapsed)
+        print(f"Queue initialized with {len(live_priority_queue)} waiting customers from the {source} "
+              f"in {elapsed * 1e3:.0f} ms.")
+
+def load_counters():
+    # Loads the windows and who each one is serving. A fresh install gets one
+    # window that handles every service.
+    counters = ServiceCounter.query.order_by(ServiceCounter.id).all()
+    if not counters:
+        db.session.add(ServiceCounter(name="Window 1"))
+        db.session.commit()
+        counters = ServiceCounter.query.order_by(ServiceCounter.id).all()
+    counter_board.load(counters)
+    known_ids = [counter.id for counter in counters]
+    # Customers called before windows existed (or by a window since deleted) belong to the first window.
+    Customer.query.filter(Customer.status == 'serving', db.or_(Customer.counter_id.is_(None), Customer.counter_id.notin_(known_ids))) \
+        .update({Customer.counter_id: known_ids[0]}, synchronize_session=False)
+    db.session.commit()
+    for customer in Customer.query.filter_by(status='serving').order_by(Customer.service_start_timestamp).all():
+        counter = counter_board.get(customer.counter_id).to_json()
+        score, _ = get_dynamic_score(customer)
+        counter_board.set_serving(counter["id"], customer.id, serving_card(customer, score, counter),
+                                  customer.service_start_timestamp)
+
+def load_service_times():
+    # Seeds the wait estimates with the latest finished services, oldest first.
+    rows = db.session.execute(
+        db.select(Customer.service_start_timestamp, Customer.completion_timestamp)
+        .where(Customer.status == 'completed', Customer.service_start_timestamp.isnot(None),
+               Customer.completion_timestamp.isnot(None))
+        .order_by(Customer.completion_timestamp.desc()).limit(SERVICE_TIME_WINDOW)).all()
+    for started, finished in reversed(rows):
+        service_times.add((finished - started).total_seconds())
+
+queue_initialized = False
+queue_init_lock = threading.Lock()
+
+def ensure_queue_initialized():
+    # When the app is started by something other than `python app.py`, the first
+    # request loads the queue. After that the in-memory queue is the source of truth,
+    # so polls never have to ask the database whether it is out of sync.
+    if not queue_initialized:
+        with queue_init_lock:
+            if not queue_initialized:
+                initialize_queue()
 
 # This line ensures the database tables are created based on our Customer model.
 with app.app_context():
     db.create_all()
 
 if __name__ == '__main__':
-    # Initialize our live queue from the database before starting the server.
-    initialize_queue()
+    # With debug=True this file runs twice: a watcher that restarts the server when the
+    # code changes, and the server itself. Only the server loads the queue, so the two
+    # don't both write the same checkpoint files.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        initialize_queue()
     # Start the Flask development web server.
     app.run(host='0.0.0.0', port=5001, debug=True)
 
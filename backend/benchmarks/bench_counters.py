@@ -0,0 +1,110 @@
+"""
+Serve throughput benchmark for many service windows working at once.
+
+Fills the PriorityQueue with waiting customers spread over a few services,
+then starts one thread per window. Each window loops: pop the best customer it
+can serve, spend --commit-ms pretending to write the status change to the
+database (the real serve-next holds its window lock across that commit), then
+push a new arrival so the queue stays the same size. It reports serves per
+second for each window count, and checks no customer was served twice.
+
+--global-lock wraps the whole serve in one shared lock, the way serve-next
+worked with a single "currently serving" slot, so the two can be compared.
+
+    python backend/benchmarks/bench_counters.py
+    python backend/benchmarks/bench_counters.py --counters 1 4 16 --seconds 3 --global-lock
+"""
+import argparse
+import datetime
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queue_engine import PriorityQueue, parse_services  # noqa: E402
+from simulator import random_record  # noqa: E402
+
+SERVICES = ["Driver's License Renewal", "Vehicle Registration", "Student Permit", "Plate Release"]
+
+
+def window_services(window):
+    # Every fourth window takes anything; the rest specialise in one or two services.
+    if window % 4 == 3:
+        return ()
+    return parse_services(", ".join(SERVICES[window % len(SERVICES):window % len(SERVICES) + 1 + window % 2]))
+
+
+def run(counters, seconds, size, commit_seconds, global_lock, seed=42):
+    rng = random.Random(seed)
+    now = datetime.datetime(2026, 1, 5, 9, 0, 0)
+    queue = PriorityQueue()
+    for i in range(size):
+        queue.push(random_record(rng, i, now - datetime.timedelta(seconds=rng.uniform(0, 3600)), SERVICES), now=now)
+
+    ids = itertools.count(size)
+    serialize = threading.Lock() if global_lock else None
+    served = [[] for _ in range(counters)]
+    stop = threading.Event()
+    barrier = threading.Barrier(counters + 1)
+
+    def serve_one(window, services, worker_rng):
+        entry = queue.pop(now=now, services=services)
+        if entry is None:
+            return
+        time.sleep(commit_seconds)
+        served[window].append(entry.id)
+        queue.push(random_record(worker_rng, next(ids), now, SERVICES), now=now)
+
+    def work(window):
+        services = window_services(window)
+        worker_rng = random.Random(seed + window)
+        barrier.wait()
+        while not stop.is_set():
+            if serialize is None:
+                serve_one(window, services, worker_rng)
+            else:
+                with serialize:
+                    serve_one(window, services, worker_rng)
+
+    threads = [threading.Thread(target=work, args=(w,)) for w in range(counters)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_served = [customer_id for window in served for customer_id in window]
+    duplicates = len(all_served) - len(set(all_served))
+    return len(all_served) / elapsed, duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counters', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--seconds', type=float, default=2.0, help='how long each run lasts')
+    parser.add_argument('--size', type=int, default=2000, help='customers waiting throughout the run')
+    parser.add_argument('--commit-ms', type=float, default=2.0, help='simulated database time per serve')
+    parser.add_argument('--global-lock', action='store_true', help='also run with every serve behind one lock')
+    args = parser.parse_args()
+
+    modes = [False, True] if args.global_lock else [False]
+    status = 0
+    for global_lock in modes:
+        print("one lock for every window" if global_lock else "per-window locks")
+        for counters in args.counters:
+            rate, duplicates = run(counters, args.seconds, args.size, args.commit_ms / 1000, global_lock)
+            print(f"  counters={counters:>3}  serves/s={rate:>9,.0f}  duplicates={duplicates}")
+            status |= bool(duplicates)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
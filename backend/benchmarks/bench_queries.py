@@ -0,0 +1,162 @@
+"""
+Query-plan benchmark for the customers table.
+
+Builds a large customers table (mostly completed history, a few hundred
+waiting, one serving), then runs the SELECTs the app itself sends: the
+start-up and reconcile reads of the waiting line, serve-next's lookup of who a
+window is serving, the start-up read of recent service times, and the
+analytics read of today's rollup. For each one it prints the database's plan
+and the median time over several runs. With --compare it drops the
+status/completion indexes and runs everything again, so you can see the
+difference between index range scans and full table scans.
+
+    python backend/benchmarks/bench_queries.py                      # 1,000,000 rows in a temp SQLite file
+    python backend/benchmarks/bench_queries.py --rows 200000 --compare
+    AYOSPILA_DATABASE_URI=mysql+pymysql://... python backend/benchmarks/bench_queries.py --rows 2000000
+
+Only point AYOSPILA_DATABASE_URI at a scratch database: this inserts the rows
+into it, and --compare drops indexes.
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STATUS_INDEXES = ('ix_customers_status_arrival', 'ix_customers_completion')
+CATEGORIES = ["Regular"] * 6 + ["PWD", "Senior Citizen", "Pregnant"]
+
+
+def populate(app_module, rows, waiting, rng):
+    Customer = app_module.Customer
+    table = Customer.__table__
+    db = app_module.db
+    now = datetime.datetime.now()
+    start = now - datetime.timedelta(days=rows // 400 + 1)  # ~400 customers a day
+    batch = []
+
+    def flush():
+        db.session.execute(table.insert(), batch)
+        batch.clear()
+
+    for i in range(rows):
+        arrival = start + datetime.timedelta(seconds=i * 216)
+        if i >= rows - waiting - 1:
+            status = 'serving' if i == rows - waiting - 1 else 'waiting'
+            arrival = now - datetime.timedelta(seconds=rng.uniform(0, 5400))
+            called = now if status == 'serving' else None
+            completion = None
+        else:
+            status = 'completed'
+            called = arrival + datetime.timedelta(minutes=rng.uniform(5, 80))
+            completion = called + datetime.timedelta(minutes=rng.uniform(2, 10))
+        batch.append({
+            "queue_number": f"R-{i:07d}", "queue_date": arrival.date(), "name": f"Customer {i}",
+            "category": rng.choice(CATEGORIES), "service": "Driver's License Renewal", "urgency": rng.randint(1, 5),
+            "has_appointment": False, "initial_priority_score": 5, "status": status,
+            "arrival_timestamp": arrival, "completion_timestamp": completion,
+            "counter_id": 1 if called else None, "service_start_timestamp": called,
+        })
+        if len(batch) == 20000:
+            flush()
+    if batch:
+        flush()
+    db.session.commit()
+    app_module.rebuild_daily_stats()
+
+
+def hot_queries(app_module):
+    # The same statements as reconcile_waiting_customers(), load_waiting_rows(),
+    # serve_next_customer(), load_service_times() and daily_stats_totals().
+    Customer = app_module.Customer
+    DSS = app_module.DailyServiceStats
+    db = app_module.db
+    func = app_module.func
+    return [
+        ("start-up and reconcile: ids of the waiting customers",
+         db.select(Customer.id).where(Customer.status == 'waiting')),
+        ("start-up without a checkpoint: the waiting rows",
+         db.select(*app_module.QUEUE_COLUMNS).where(Customer.status == 'waiting')),
+        ("serve-next: who this window is serving",
+         db.select(Customer).where(Customer.status == 'serving', Customer.counter_id == 1)),
+        ("start-up: the latest service times",
+         db.select(Customer.service_start_timestamp, Customer.completion_timestamp)
+         .where(Customer.status == 'completed', Customer.service_start_timestamp.isnot(None),
+                Customer.completion_timestamp.isnot(None))
+         .order_by(Customer.completion_timestamp.desc()).limit(app_module.SERVICE_TIME_WINDOW)),
+        ("analytics: today's rollup rows (earlier days are cached)",
+         db.select(DSS.category, DSS.urgency, func.sum(DSS.arrived_count), func.sum(DSS.completed_count),
+                   func.sum(DSS.total_wait_seconds))
+         .where(DSS.stats_date == datetime.date.today()).group_by(DSS.category, DSS.urgency)),
+    ]
+
+
+def explain(app_module, statement):
+    db = app_module.db
+    compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = db.session.execute(db.text(prefix + str(compiled))).all()
+    if db.engine.dialect.name == 'sqlite':
+        return [row[-1] for row in rows]
+    return [', '.join(f"{key}={value}" for key, value in row._mapping.items() if value is not None) for row in rows]
+
+
+def time_query(app_module, statement, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        app_module.db.session.execute(statement).all()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def report(app_module, repeats, title):
+    print(f"\n=== {title} ===")
+    for name, statement in hot_queries(app_module):
+        median = time_query(app_module, statement, repeats)
+        print(f"\n{name}: {median * 1e3:.3f} ms")
+        for line in explain(app_module, statement):
+            print(f"    {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--waiting', type=int, default=300)
+    parser.add_argument('--repeats', type=int, default=9)
+    parser.add_argument('--compare', action='store_true', help='also run without the status/completion indexes')
+    args = parser.parse_args()
+
+    tmp = None
+    if 'AYOSPILA_DATABASE_URI' not in os.environ:
+        tmp = tempfile.TemporaryDirectory()
+        os.environ['AYOSPILA_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp.name, 'queries.db')}"
+
+    import app as app_module  # noqa: E402  (imported after AYOSPILA_DATABASE_URI is set)
+    with app_module.app.app_context():
+        started = time.perf_counter()
+        populate(app_module, args.rows, args.waiting, random.Random(7))
+        if app_module.db.engine.dialect.name == 'sqlite':
+            app_module.db.session.execute(app_module.db.text('ANALYZE'))
+        print(f"populated {args.rows:,} rows in {time.perf_counter() - started:.1f}s "
+              f"({app_module.db.engine.dialect.name})")
+        report(app_module, args.repeats, "with indexes")
+
+        if args.compare:
+            app_module.db.session.remove()
+            for index in app_module.Customer.__table__.indexes:
+                if index.name in STATUS_INDEXES:
+                    index.drop(app_module.db.engine)
+            app_module.db.engine.dispose()  # fresh connections, so no cached plans survive
+            report(app_module, args.repeats, "without status/completion indexes")
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
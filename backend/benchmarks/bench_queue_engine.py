@@ -0,0 +1,67 @@
+"""
+Serve-next latency benchmark for the in-memory PriorityQueue.
+
+Fills the queue with N waiting customers whose arrivals are spread over the
+last hour (so plenty of aging marks are pending), then measures steady-state
+serve-next: one pop() plus one new arrival push() to keep the size constant.
+In that steady state the hall serves N people per hour, so the simulated clock
+moves 3600/N seconds per serve and every pop() also pays for the aging marks
+that came due in the meantime.
+
+    python backend/benchmarks/bench_queue_engine.py
+    python backend/benchmarks/bench_queue_engine.py --sizes 100 1000 100000 --ops 20000
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queue_engine import PriorityQueue  # noqa: E402
+from simulator import random_record  # noqa: E402
+
+SERVICES = ["Driver's License Renewal"]   # one service, so every pop looks at a single lane
+
+
+def run(size, ops, seed=42):
+    rng = random.Random(seed)
+    start = datetime.datetime(2026, 1, 5, 8, 0, 0)
+    now = start + datetime.timedelta(hours=1)
+    queue = PriorityQueue()
+    for i in range(size):
+        arrival = start + datetime.timedelta(seconds=rng.uniform(0, 3600))
+        queue.push(random_record(rng, i, arrival, SERVICES), now=now)
+
+    next_id = size
+    step = datetime.timedelta(seconds=3600 / size)
+    samples = []
+    for _ in range(ops):
+        now += step
+        t0 = time.perf_counter()
+        queue.pop(now=now)
+        samples.append(time.perf_counter() - t0)
+        queue.push(random_record(rng, next_id, now, SERVICES), now=now)
+        next_id += 1
+
+    samples.sort()
+    mean = sum(samples) / len(samples)
+    return mean, samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--ops', type=int, default=10000, help='serve-next operations per size')
+    args = parser.parse_args()
+
+    print(f"{'waiting':>10} {'mean us':>10} {'p50 us':>10} {'p99 us':>10}")
+    for size in args.sizes:
+        mean, p50, p99 = run(size, args.ops)
+        print(f"{size:>10} {mean * 1e6:>10.2f} {p50 * 1e6:>10.2f} {p99 * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Start-up benchmark: how long it takes to get the live queue back after a restart.
+
+Fills a throwaway SQLite file with N waiting customers, then times three ways
+of rebuilding the queue:
+
+  orm         Customer.query(...).all() and one push() per customer (the old start-up)
+  columns     the columns the queue needs as plain rows, then one bulk load()
+  checkpoint  the on-disk snapshot plus its log, one bulk load(), and the id-only
+              check against the database that start-up does to catch missed changes
+
+    python backend/benchmarks/bench_restart.py
+    python backend/benchmarks/bench_restart.py --sizes 1000 10000 100000
+"""
+import argparse
+import datetime
+import gc
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ["Regular"] * 6 + ["PWD", "Senior Citizen", "Pregnant"]
+SERVICES = ["Driver's License Renewal", "Vehicle Registration", "Driver's License Renewal, Vehicle Registration"]
+
+
+def fill(app_module, size, rng):
+    now = datetime.datetime.now()
+    rows = [{
+        "queue_number": f"R-{i:06d}", "queue_date": now.date(), "name": f"Customer {i}",
+        "category": rng.choice(CATEGORIES), "service": rng.choice(SERVICES), "urgency": rng.randint(1, 5),
+        "has_appointment": False, "initial_priority_score": rng.randint(3, 15), "status": "waiting",
+        "arrival_timestamp": now - datetime.timedelta(seconds=rng.uniform(0, 7200)),
+    } for i in range(size)]
+    db = app_module.db
+    db.session.execute(db.delete(app_module.Customer))
+    for offset in range(0, size, 20000):
+        db.session.execute(app_module.Customer.__table__.insert(), rows[offset:offset + 20000])
+    db.session.commit()
+
+
+def timed(action, repeats):
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        gc.disable()  # start-up restores with the collector paused, so measure it that way too
+        try:
+            started = time.perf_counter()
+            action()
+            timings.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return min(timings)
+
+
+def run(app_module, size, repeats, state_dir):
+    from queue_engine import PriorityQueue
+    from queue_journal import QueueJournal
+    Customer = app_module.Customer
+    fill(app_module, size, random.Random(size))
+
+    def orm():
+        queue = PriorityQueue()
+        for customer in Customer.query.filter(Customer.status == 'waiting').order_by(Customer.arrival_timestamp).all():
+            queue.push(customer)
+        app_module.db.session.expunge_all()
+
+    def columns():
+        PriorityQueue().load(app_module.load_waiting_rows())
+
+    shutil.rmtree(state_dir, ignore_errors=True)
+    seeded = PriorityQueue()
+    seeded.load(app_module.load_waiting_rows())
+    QueueJournal(state_dir).checkpoint(seeded)
+
+    def checkpoint():
+        queue = PriorityQueue()
+        queue.load(QueueJournal(state_dir).restore())
+        waiting_ids = set(app_module.db.session.execute(
+            app_module.db.select(Customer.id).where(Customer.status == 'waiting')).scalars())
+        assert waiting_ids == set(queue.get_all_item_ids())
+
+    results = {name: timed(action, repeats) for name, action in
+               (('orm', orm), ('columns', columns), ('checkpoint', checkpoint))}
+    print(f"n={size:>7}  " + "  ".join(f"{name}={seconds * 1e3:8.1f} ms" for name, seconds in results.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['AYOSPILA_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'restart.db')}"
+        os.environ['AYOSPILA_QUEUE_STATE_DIR'] = os.path.join(tmp, 'queue_state')
+        import app as app_module  # noqa: E402  (imported after the environment is set)
+        with app_module.app.app_context():
+            for size in args.sizes:
+                run(app_module, size, args.repeats, os.path.join(tmp, 'bench_state'))
+
+
+if __name__ == '__main__':
+    main()
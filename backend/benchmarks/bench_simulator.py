@@ -0,0 +1,58 @@
+"""
+Simulator benchmark: how long simulate() takes to play a generated day.
+
+For each size, generates a day of N arrivals over 8 hours and serves it with
+enough windows to keep up (about 85% busy at a 6 minute mean service time),
+then times a plain run and a run that also makes the registration wait
+estimate at every arrival, and prints how far off those estimates were.
+
+    python backend/benchmarks/bench_simulator.py
+    python backend/benchmarks/bench_simulator.py --sizes 1000 5000 --repeats 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator import simulate, synthetic_day  # noqa: E402
+
+HOURS = 8
+SERVICE_MINUTES = 6
+UTILIZATION = 0.85
+
+
+def timed(action, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = action()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def run(size, repeats):
+    customers = synthetic_day(random.Random(size), size, HOURS, SERVICE_MINUTES)
+    windows = [()] * max(1, round(size * SERVICE_MINUTES / (HOURS * 60 * UTILIZATION)))
+    plain, result = timed(lambda: simulate(customers, windows), repeats)
+    predicting, predicted = timed(lambda: simulate(customers, windows, predict=True), repeats)
+    mean_wait = result.summary()[0][2]
+    absolute, bias = predicted.prediction_error()
+    print(f"n={size:>6}  windows={len(windows):>3}  simulate={plain * 1e3:7.1f} ms  "
+          f"with estimates={predicting * 1e3:7.1f} ms  mean wait={mean_wait:5.1f} min  "
+          f"estimate error={absolute:4.1f} min (bias {bias:+.1f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000, 3000, 10000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.repeats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Load test for the queue API: plays a day at the branch against the endpoints
+and reports latency percentiles and throughput for each one.
+
+A day is generated up front as a timeline of simulated events:
+
+  arrivals   POST /api/customers, a Poisson stream with a realistic mix of
+             categories, urgency levels, appointments and services
+  serves     POST /api/queue/serve-next, each window calling the next customer
+             whenever it finishes one (service times are log-normal)
+  polls      GET /api/queue from every display board, revalidating with its ETag
+  analytics  GET /api/analytics from the supervisor's dashboard
+
+The timeline is then dispatched in order to a pool of client threads, as fast
+as they can go. In-process runs move the app's clock along with the timeline,
+so customers age (and get re-ranked) exactly as they would over a real day.
+
+    python backend/benchmarks/load_test.py                            # SQLite in memory-backed storage
+    python backend/benchmarks/load_test.py --arrivals 3000 --counters 8 --boards 20 --threads 16
+    python backend/benchmarks/load_test.py --database sqlite:////tmp/load.db --json results.json
+    python backend/benchmarks/load_test.py --url http://127.0.0.1:5001  # a running server (real clock)
+
+Only point --database or --url at scratch data: the run registers and serves customers.
+"""
+import argparse
+import collections
+import datetime
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator import arrival_stream  # noqa: E402  (the same arrivals the simulator generates)
+
+OPENING_TIME = datetime.time(8, 0)
+
+
+class SimulatedClock:
+    # A clock the dispatcher moves forward as it works through the timeline.
+    def __init__(self, start):
+        self._now = start
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self._now
+
+    def advance_to(self, moment):
+        with self._lock:
+            if moment > self._now:
+                self._now = moment
+
+
+def build_timeline(args, rng):
+    # Every request of the day as (seconds after opening, sequence, endpoint, method, path, payload).
+    events = []
+    sequence = 0
+
+    def add(moment, endpoint, method, path, payload=None):
+        nonlocal sequence
+        events.append((moment, sequence, endpoint, method, path, payload))
+        sequence += 1
+
+    day_seconds = args.hours * 3600
+    counter_ids = args.counter_ids
+    for moment, payload in arrival_stream(rng, args.arrivals, args.hours):
+        add(moment, 'add_customer', 'POST', '/api/customers', payload)
+    # Windows start a few minutes after opening, then serve back to back.
+    service_mu = math.log(args.service_minutes * 60) - 0.125  # log-normal with sigma 0.5 and this mean
+    for counter_id in counter_ids:
+        moment = rng.uniform(120, 600)
+        while moment < day_seconds:
+            add(moment, 'serve_next_customer', 'POST', '/api/queue/serve-next', {"counterId": counter_id})
+            moment += rng.lognormvariate(service_mu, 0.5)
+    for _board in range(args.boards):
+        moment = rng.uniform(0, args.poll_seconds)
+        while moment < day_seconds:
+            add(moment, 'get_queue_status', 'GET', '/api/queue')
+            moment += args.poll_seconds
+    moment = 0.0
+    while moment < day_seconds:
+        add(moment, 'get_analytics', 'GET', '/api/analytics')
+        moment += args.analytics_seconds
+    events.sort()
+    return events
+
+
+class InProcessClient:
+    # Calls the app through Flask's test client; one per thread.
+    def __init__(self, app_module):
+        self._app = app_module.app
+        self._local = threading.local()
+
+    def request(self, method, path, payload, headers, with_body=False):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        response = client.open(path, method=method, json=payload, headers=headers)
+        if with_body:
+            return response.status_code, response.headers.get('ETag'), response.get_data()
+        return response.status_code, response.headers.get('ETag')
+
+
+class HttpClient:
+    # Calls a running server over keep-alive HTTP connections; one per thread.
+    def __init__(self, url):
+        self._url = urlsplit(url)
+        self._local = threading.local()
+
+    def request(self, method, path, payload, headers, with_body=False):
+        headers = dict(headers)
+        body = None
+        if payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(
+                    self._url.hostname, self._url.port or 80, timeout=60)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                if with_body:
+                    return response.status, response.getheader('ETag'), data
+                return response.status, response.getheader('ETag')
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+
+
+def create_counters(app_module, count):
+    # Every third window specialises in licensing; the rest take anyone.
+    with app_module.app.app_context():
+        existing = app_module.ServiceCounter.query.count()
+        for number in range(existing + 1, count + 1):
+            services = "Driver's License Renewal, New Driver's License, Student Permit" if number % 3 == 0 else None
+            app_module.db.session.add(app_module.ServiceCounter(name=f"Window {number}", services=services))
+        app_module.db.session.commit()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run(events, client, threads, clock, opening):
+    latencies = collections.defaultdict(list)
+    failures = collections.Counter()
+    results_lock = threading.Lock()
+    board_etag = {}   # boards share one ETag slot per thread, like a browser cache would
+    in_flight = threading.BoundedSemaphore(threads * 2)  # keeps the clock from running far ahead of the requests
+
+    def send(endpoint, method, path, payload):
+        try:
+            headers = {}
+            if endpoint == 'get_queue_status' and threading.get_ident() in board_etag:
+                headers['If-None-Match'] = board_etag[threading.get_ident()]
+            started = time.perf_counter()
+            try:
+                status, etag = client.request(method, path, payload, headers)
+            except Exception:
+                status, etag = 'exception', None
+            elapsed = time.perf_counter() - started
+            if endpoint == 'get_queue_status' and etag:
+                board_etag[threading.get_ident()] = etag
+            with results_lock:
+                latencies[endpoint].append(elapsed)
+                if status not in (200, 201, 304):
+                    failures[(endpoint, status)] += 1
+        finally:
+            in_flight.release()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for moment, _sequence, endpoint, method, path, payload in events:
+            in_flight.acquire()
+            if clock is not None:
+                clock.advance_to(opening + datetime.timedelta(seconds=moment))
+            pool.submit(send, endpoint, method, path, payload)
+    return time.perf_counter() - started, latencies, failures
+
+
+def report(elapsed, latencies, failures):
+    rows = []
+    print(f"\n{'endpoint':<22}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'req/s':>9}")
+    for endpoint in sorted(latencies):
+        samples = sorted(latencies[endpoint])
+        errors = sum(count for (name, _status), count in failures.items() if name == endpoint)
+        row = {"endpoint": endpoint, "requests": len(samples), "errors": errors,
+               "p50_ms": percentile(samples, 0.50) * 1e3, "p95_ms": percentile(samples, 0.95) * 1e3,
+               "p99_ms": percentile(samples, 0.99) * 1e3, "max_ms": samples[-1] * 1e3,
+               "throughput": len(samples) / elapsed}
+        rows.append(row)
+        print(f"{endpoint:<22}{row['requests']:>9}{errors:>8}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+              f"{row['p99_ms']:>9.2f}{row['max_ms']:>9.2f}{row['throughput']:>9.0f}")
+    total = sum(row["requests"] for row in rows)
+    print(f"\n{total} requests in {elapsed:.1f}s ({total / elapsed:,.0f}/s overall)")
+    for (endpoint, status), count in sorted(failures.items(), key=str):
+        print(f"  {endpoint}: {count} x {status}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', help='SQLAlchemy URI for in-process runs (default: a fresh SQLite file, '
+                                           'in /dev/shm when available)')
+    parser.add_argument('--url', help='drive a running server instead of the app in this process')
+    parser.add_argument('--arrivals', type=int, default=1500, help='customers registering during the day')
+    parser.add_argument('--hours', type=float, default=8.0, help='length of the simulated day')
+    parser.add_argument('--counters', type=int, default=6, help='service windows calling customers')
+    parser.add_argument('--service-minutes', type=float, default=6.0, help='mean time a window spends per customer')
+    parser.add_argument('--boards', type=int, default=10, help='display boards polling /api/queue')
+    parser.add_argument('--poll-seconds', type=float, default=15.0, help='how often each board polls (simulated)')
+    parser.add_argument('--analytics-seconds', type=float, default=60.0, help='how often analytics is fetched')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent client threads')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the results to this file, for comparing runs')
+    args = parser.parse_args()
+
+    tmp = None
+    clock = None
+    opening = datetime.datetime.combine(datetime.date.today(), OPENING_TIME)
+    if args.url:
+        client = HttpClient(args.url)
+        target = args.url
+    else:
+        tmp = tempfile.TemporaryDirectory(dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+        os.environ['AYOSPILA_DATABASE_URI'] = args.database or f"sqlite:///{os.path.join(tmp.name, 'load.db')}"
+        os.environ['AYOSPILA_QUEUE_STATE_DIR'] = os.path.join(tmp.name, 'queue_state')
+        import app as app_module  # noqa: E402  (imported after the environment is set)
+        clock = SimulatedClock(opening)
+        app_module.use_clock(clock)
+        create_counters(app_module, args.counters)
+        app_module.ensure_queue_initialized()
+        client = InProcessClient(app_module)
+        target = app_module.app.config['SQLALCHEMY_DATABASE_URI']
+
+    # Serve from the windows the server actually has (a running server may have fewer).
+    status, _etag, body = client.request('GET', '/api/counters', None, {}, with_body=True)
+    args.counter_ids = [counter["id"] for counter in json.loads(body)["counters"]][:args.counters]
+    events = build_timeline(args, random.Random(args.seed))
+
+    print(f"{len(events)} requests: {args.arrivals} arrivals, {args.counters} windows, {args.boards} boards, "
+          f"{args.threads} threads -> {target}")
+    elapsed, latencies, failures = run(events, client, args.threads, clock, opening)
+    rows = report(elapsed, latencies, failures)
+    if args.json:
+        with open(args.json, 'w') as results_file:
+            json.dump({"settings": vars(args), "elapsed_seconds": elapsed, "endpoints": rows}, results_file, indent=2)
+    if tmp:
+        tmp.cleanup()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Load test for /api/queue/stream: simulates many display boards at once.
+
+Opens N concurrent SSE connections to a running server, then (optionally)
+registers customers and serves them at a steady rate. Every subscriber records
+how long each 'add' event took to reach it after the registration was sent,
+so you can see both the fan-out latency and, with --server-pid, how much CPU
+the server burns while hundreds of boards sit idle.
+
+    python backend/app.py &
+    python backend/benchmarks/sse_load.py --subscribers 300 --idle 30 --events 50 --server-pid <pid>
+"""
+import argparse
+import http.client
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def read_cpu_seconds(pid):
+    # utime + stime from /proc/<pid>/stat (Linux only).
+    with open(f"/proc/{pid}/stat") as stat_file:
+        fields = stat_file.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Subscriber(threading.Thread):
+    def __init__(self, base_url, sent_times, latencies, latencies_lock, ready):
+        super().__init__(daemon=True)
+        self.base_url = urlsplit(base_url)
+        self.sent_times = sent_times
+        self.latencies = latencies
+        self.latencies_lock = latencies_lock
+        self.ready = ready
+        self.errors = 0
+
+    def run(self):
+        try:
+            connection = http.client.HTTPConnection(self.base_url.hostname, self.base_url.port or 80, timeout=120)
+            connection.request('GET', '/api/queue/stream', headers={'Accept': 'text/event-stream'})
+            response = connection.getresponse()
+            event = None
+            for raw_line in response:
+                line = raw_line.decode('utf-8').rstrip('\n')
+                if line.startswith('event: '):
+                    event = line[7:]
+                elif line.startswith('data: '):
+                    if event == 'snapshot':
+                        self.ready.release()
+                    elif event == 'add':
+                        received = time.perf_counter()
+                        sent = self.sent_times.get(json.loads(line[6:])['name'])
+                        if sent is not None:
+                            with self.latencies_lock:
+                                self.latencies.append(received - sent)
+        except OSError:
+            self.errors += 1
+            self.ready.release()
+
+
+def post(base_url, path, payload=None):
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    body = json.dumps(payload or {})
+    connection.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5001')
+    parser.add_argument('--subscribers', type=int, default=200)
+    parser.add_argument('--idle', type=float, default=20, help='seconds to sit idle before driving changes')
+    parser.add_argument('--events', type=int, default=50, help='registrations to send (each is followed by a serve)')
+    parser.add_argument('--rate', type=float, default=5, help='registrations per second')
+    parser.add_argument('--server-pid', type=int, help='report the server CPU time used during the idle phase')
+    args = parser.parse_args()
+
+    sent_times, latencies, latencies_lock = {}, [], threading.Lock()
+    ready = threading.Semaphore(0)
+    subscribers = [Subscriber(args.url, sent_times, latencies, latencies_lock, ready)
+                   for _ in range(args.subscribers)]
+    for subscriber in subscribers:
+        subscriber.start()
+    for _ in subscribers:
+        ready.acquire()
+    connected = sum(1 for s in subscribers if not s.errors)
+    print(f"{connected}/{args.subscribers} subscribers connected")
+
+    if args.idle:
+        cpu_before = read_cpu_seconds(args.server_pid) if args.server_pid else None
+        time.sleep(args.idle)
+        if cpu_before is not None:
+            used = read_cpu_seconds(args.server_pid) - cpu_before
+            print(f"idle: server used {used:.3f}s CPU in {args.idle:.0f}s ({used / args.idle * 100:.2f}% of a core)")
+
+    run_id = int(time.time())
+    for i in range(args.events):
+        name = f"Load {run_id}-{i}"
+        sent_times[name] = time.perf_counter()
+        post(args.url, '/api/customers', {"fullName": name, "category": "Regular", "urgency": 1,
+                                          "services": ["Driver's License Renewal"], "appointment": {"status": "no"}})
+        post(args.url, '/api/queue/serve-next')
+        time.sleep(1 / args.rate)
+
+    time.sleep(1)  # let the last events arrive
+    with latencies_lock:
+        samples = sorted(latencies)
+    expected = args.events * connected
+    print(f"delivered {len(samples)}/{expected} add events")
+    print(f"latency ms  p50={percentile(samples, 0.5) * 1e3:.2f}  p95={percentile(samples, 0.95) * 1e3:.2f}  "
+          f"p99={percentile(samples, 0.99) * 1e3:.2f}  max={percentile(samples, 1.0) * 1e3:.2f}")
+
+
+if __name__ == '__main__':
+    main()
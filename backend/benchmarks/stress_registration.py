@@ -0,0 +1,112 @@
+"""
+Concurrent registration stress test for queue number allocation.
+
+Points the app at a throwaway SQLite file, pre-fills the customers table with
+a given number of old rows, then fires registrations from many threads at once
+through POST /api/customers. It checks that every request succeeded and that
+no queue number was handed out twice, and reports registrations per second so
+you can compare runs with a small and a large table.
+
+    python backend/benchmarks/stress_registration.py
+    python backend/benchmarks/stress_registration.py --existing 0 200000 --threads 16 --per-thread 50
+"""
+import argparse
+import collections
+import datetime
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORIES = ["Regular", "PWD", "Senior Citizen", "Pregnant"]
+
+
+def prefill(app_module, count):
+    # Old history from previous days, inserted in bulk so setup stays quick.
+    if not count:
+        return
+    Customer = app_module.Customer
+    start = datetime.datetime.now() - datetime.timedelta(days=365)
+    rows = []
+    for i in range(count):
+        arrival = start + datetime.timedelta(minutes=i)
+        rows.append({
+            "queue_number": f"R-{i:07d}", "queue_date": arrival.date(),
+            "name": f"Old {i}", "category": "Regular", "service": "", "urgency": 1,
+            "has_appointment": False, "initial_priority_score": 3, "status": "completed",
+            "arrival_timestamp": arrival, "completion_timestamp": arrival + datetime.timedelta(minutes=20),
+        })
+    with app_module.app.app_context():
+        for offset in range(0, count, 10000):
+            app_module.db.session.execute(Customer.__table__.insert(), rows[offset:offset + 10000])
+        app_module.db.session.commit()
+
+
+def run_once(existing, threads, per_thread):
+    import app as app_module  # noqa: E402  (imported after AYOSPILA_DATABASE_URI is set)
+    prefill(app_module, existing)
+    app_module.app.config['TESTING'] = True
+    failures = collections.Counter()
+    numbers = []
+    numbers_lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def register(worker):
+        client = app_module.app.test_client()
+        barrier.wait()
+        for i in range(per_thread):
+            response = client.post('/api/customers', json={
+                "fullName": f"Stress {worker}-{i}", "category": CATEGORIES[(worker + i) % len(CATEGORIES)],
+                "urgency": 1 + i % 5, "services": ["Driver's License Renewal"], "appointment": {"status": "no"},
+            })
+            if response.status_code != 201:
+                failures[response.status_code] += 1
+                continue
+            with numbers_lock:
+                numbers.append(response.get_json()["customer"]["queueNumber"])
+
+    workers = [threading.Thread(target=register, args=(w,)) for w in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    duplicates = [number for number, seen in collections.Counter(numbers).items() if seen > 1]
+    total = threads * per_thread
+    print(f"existing={existing:>8}  registrations={total}  ok={len(numbers)}  failed={dict(failures)}  "
+          f"duplicates={len(duplicates)}  throughput={total / elapsed:,.0f}/s")
+    return 0 if not failures and not duplicates else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--existing', type=int, nargs='+', default=[0, 100000],
+                        help='rows already in the customers table (one run per value)')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--per-thread', type=int, default=50)
+    parser.add_argument('--run-one', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one is not None:
+        # Child process: one fresh database, one measurement.
+        sys.path.insert(0, BACKEND_DIR)
+        sys.exit(run_once(args.run_one, args.threads, args.per_thread))
+
+    status = 0
+    for existing in args.existing:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, AYOSPILA_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'stress.db')}",
+                       AYOSPILA_QUEUE_STATE_DIR=os.path.join(tmp, 'queue_state'))
+            # Each size runs in its own process so the app module starts from a clean slate.
+            status |= subprocess.call([sys.executable, __file__, '--run-one', str(existing),
+                                       '--threads', str(args.threads), '--per-thread', str(args.per_thread)], env=env)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+-- Daily, per-prefix queue numbers (e.g. R-001 restarts every morning).
+--
+-- Queue numbers used to come from COUNT(*) over the whole customers table.
+-- They now come from one counter row per (prefix, day), so the same number
+-- can appear again on a later day and uniqueness moves to (queue_date, queue_number).
+-- Run once against an existing lto_queue_db (MySQL 8):
+--   mysql -u root -p lto_queue_db < backend/migrations/001_daily_queue_numbers.sql
+
+ALTER TABLE `customers` ADD COLUMN `queue_date` date DEFAULT NULL AFTER `queue_number`;
+UPDATE `customers` SET `queue_date` = DATE(`arrival_timestamp`);
+ALTER TABLE `customers`
+  MODIFY `queue_date` date NOT NULL,
+  DROP INDEX `queue_number`,
+  DROP INDEX `queue_number_2`,
+  ADD UNIQUE KEY `uq_customers_queue_date_number` (`queue_date`, `queue_number`);
+
+CREATE TABLE IF NOT EXISTS `queue_counters` (
+  `prefix` varchar(5) NOT NULL,
+  `queue_date` date NOT NULL,
+  `last_value` int NOT NULL,
+  PRIMARY KEY (`prefix`, `queue_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Start each existing (prefix, day) counter after the highest number already used,
+-- so registrations made right after the upgrade can't collide with earlier ones.
+INSERT INTO `queue_counters` (`prefix`, `queue_date`, `last_value`)
+SELECT SUBSTRING_INDEX(`queue_number`, '-', 1), `queue_date`,
+       MAX(CAST(SUBSTRING_INDEX(`queue_number`, '-', -1) AS UNSIGNED))
+FROM `customers`
+GROUP BY SUBSTRING_INDEX(`queue_number`, '-', 1), `queue_date`
+ON DUPLICATE KEY UPDATE `last_value` = GREATEST(`last_value`, VALUES(`last_value`));
@@ -0,0 +1,28 @@
+-- Daily analytics rollup.
+--
+-- /api/analytics used to load every completed customer into Python. It now
+-- reads daily_service_stats, which the app updates in the same transaction
+-- as each registration and each completed serve.
+-- Run once after 001 (MySQL 8):
+--   mysql -u root -p lto_queue_db < backend/migrations/002_daily_service_stats.sql
+-- The backfill below is the same grouped query as `flask --app app rebuild-stats`.
+
+CREATE TABLE IF NOT EXISTS `daily_service_stats` (
+  `stats_date` date NOT NULL,
+  `category` varchar(50) NOT NULL,
+  `urgency` int NOT NULL,
+  `arrived_count` int NOT NULL DEFAULT 0,
+  `completed_count` int NOT NULL DEFAULT 0,
+  `total_wait_seconds` double NOT NULL DEFAULT 0,
+  PRIMARY KEY (`stats_date`, `category`, `urgency`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+DELETE FROM `daily_service_stats`;
+INSERT INTO `daily_service_stats`
+  (`stats_date`, `category`, `urgency`, `arrived_count`, `completed_count`, `total_wait_seconds`)
+SELECT `queue_date`, `category`, COALESCE(`urgency`, 1), COUNT(`id`),
+       SUM(CASE WHEN `status` = 'completed' AND `completion_timestamp` IS NOT NULL THEN 1 ELSE 0 END),
+       SUM(CASE WHEN `status` = 'completed' AND `completion_timestamp` IS NOT NULL
+                THEN TIMESTAMPDIFF(SECOND, `arrival_timestamp`, `completion_timestamp`) ELSE 0 END)
+FROM `customers`
+GROUP BY `queue_date`, `category`, COALESCE(`urgency`, 1);
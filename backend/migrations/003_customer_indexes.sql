@@ -0,0 +1,21 @@
+-- Compact primary key and indexes for the hot queries on `customers`.
+--
+-- The 36-character UUID primary key becomes an auto-increment BIGINT, so new rows
+-- append to the end of the clustered index instead of landing at random pages,
+-- and every secondary index (which stores the primary key) shrinks with it.
+-- The new indexes cover the queries that filter on status first, and the
+-- completion-time lookups.
+-- Nothing else references customers.id, so existing rows simply get new ids.
+-- Stop the app before running this (MySQL 8):
+--   mysql -u root -p lto_queue_db < backend/migrations/003_customer_indexes.sql
+
+ALTER TABLE `customers`
+  DROP PRIMARY KEY,
+  DROP COLUMN `id`,
+  ADD COLUMN `id` bigint NOT NULL AUTO_INCREMENT FIRST,
+  ADD PRIMARY KEY (`id`),
+  ADD KEY `ix_customers_status_arrival` (`status`, `arrival_timestamp`),
+  ADD KEY `ix_customers_status_category` (`status`, `category`),
+  ADD KEY `ix_customers_completion` (`completion_timestamp`);
+
+ANALYZE TABLE `customers`;
@@ -0,0 +1,19 @@
+-- Service windows, and which window called each customer.
+--
+-- `services` is comma-joined like customers.service; NULL means the window
+-- handles every service. The app creates "Window 1" on start-up if the table is
+-- empty, so existing single-window setups keep working unchanged. Add more with
+--   flask --app backend/app.py add-counter "Window 2" --service "Driver's License Renewal"
+-- Run with (MySQL 8):
+--   mysql -u root -p lto_queue_db < backend/migrations/004_service_counters.sql
+
+CREATE TABLE `service_counters` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `name` varchar(50) NOT NULL,
+  `services` text,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+ALTER TABLE `customers`
+  ADD COLUMN `counter_id` int DEFAULT NULL,
+  ADD COLUMN `service_start_timestamp` datetime DEFAULT NULL;
@@ -0,0 +1,10 @@
+-- Drop `ix_customers_status_category`, added by 003_customer_indexes.sql.
+--
+-- No query uses it: analytics reads the daily_service_stats rollup instead of
+-- counting customers by status and category, and the queries that filter on
+-- status are answered by `ix_customers_status_arrival`. Every registration and
+-- status change was paying to keep it up to date.
+-- Run with (MySQL 8):
+--   mysql -u root -p lto_queue_db < backend/migrations/005_drop_status_category_index.sql
+
+ALTER TABLE `customers` DROP INDEX `ix_customers_status_category`;
@@ -0,0 +1,495 @@
+import collections
+import datetime
+import functools
+import heapq
+import itertools
+import threading
+import time
+
+# --- Priority Scoring ---
+# The points a customer starts with. The weights are kept in one place so the
+# simulator (simulator.py) can try other ones on the same code.
+ScoreWeights = collections.namedtuple('ScoreWeights', ('category_points', 'urgency', 'appointment'))
+SCORE_WEIGHTS = ScoreWeights({"PWD": 5, "Senior Citizen": 4, "Pregnant": 4, "Regular": 1}, urgency=2, appointment=2)
+
+
+def initial_priority_score(category, urgency, has_appointment, weights=SCORE_WEIGHTS):
+    score = weights.category_points.get(category, 1) + urgency * weights.urgency
+    if has_appointment:
+        score += weights.appointment
+    return score
+
+
+# --- Aging Rules ---
+# A waiting customer earns extra points the longer they wait. These are step
+# functions of the whole minutes waited, so we know in advance the exact moment
+# each customer's score will change next.
+AGING_STEPS = ((30, 5), (20, 3), (10, 1))  # (minutes waited, bonus points), biggest first
+REGULAR_AGING_MINUTES = 25                 # Regular customers get an extra boost at this mark
+REGULAR_AGING_BONUS = 3
+
+# The rules as one value, so a queue can be given different ones. `steps` must be biggest first.
+AgingRules = collections.namedtuple('AgingRules', ('steps', 'regular_minutes', 'regular_bonus'))
+DEFAULT_AGING = AgingRules(AGING_STEPS, REGULAR_AGING_MINUTES, REGULAR_AGING_BONUS)
+
+
+def aging_bonus(category, wait_minutes, rules=DEFAULT_AGING):
+    bonus = 0
+    for minutes, points in rules.steps:
+        if wait_minutes >= minutes:
+            bonus = points
+            break
+    if category == "Regular" and wait_minutes >= rules.regular_minutes:
+        bonus += rules.regular_bonus
+    return bonus
+
+
+@functools.lru_cache(maxsize=64)
+def aging_marks(category, rules=DEFAULT_AGING):
+    # All the minute marks (ascending) at which this category's bonus can change.
+    marks = [minutes for minutes, _ in rules.steps]
+    if category == "Regular":
+        marks.append(rules.regular_minutes)
+    return tuple(sorted(marks))
+
+
+def wait_minutes_at(arrival_timestamp, now):
+    return int((now - arrival_timestamp).total_seconds() / 60)
+
+
+# --- Service Routing ---
+# Every waiting customer sits in a few "lanes": the lane of every service they
+# asked for, plus the lane holding everybody. A counter only looks at the lanes
+# of the services it handles.
+ALL_SERVICES = '*'   # lane with every waiting customer, used by counters that handle everything
+NO_SERVICE = ''      # lane for customers who didn't pick a service; any counter can take them
+
+
+def parse_services(service_text):
+    # Customer.service is stored as a comma-joined string ("A, B").
+    if not service_text:
+        return ()
+    return tuple(name.strip() for name in service_text.split(',') if name.strip())
+
+
+@functools.lru_cache(maxsize=1024)
+def lanes_for_customer(service_text):
+    # The lanes a customer waits in. There are only a few distinct service strings,
+    # so customers share the parsed tuple instead of re-splitting it every push.
+    return (ALL_SERVICES,) + (parse_services(service_text) or (NO_SERVICE,))
+
+
+def lanes_for_counter(services):
+    # The lanes a counter handling these services pulls from (all of them if it handles everything).
+    if not services:
+        return (ALL_SERVICES,)
+    return tuple(services) + (NO_SERVICE,)
+
+
+class QueueEntry:
+    # The small in-memory record we keep for every waiting customer, so the
+    # queue never has to go back to the database to rank or display people.
+    __slots__ = ('id', 'queue_number', 'name', 'category', 'service', 'urgency', 'lanes',
+                 'base_score', 'arrival_timestamp', 'score', 'pending_marks', 'display_cache')
+
+    def __init__(self, customer_obj):
+        self.id = customer_obj.id
+        self.queue_number = customer_obj.queue_number
+        self.name = customer_obj.name
+        self.category = customer_obj.category
+        self.service = customer_obj.service
+        self.urgency = customer_obj.urgency
+        self.lanes = lanes_for_customer(self.service)
+        self.base_score = customer_obj.initial_priority_score
+        self.arrival_timestamp = customer_obj.arrival_timestamp
+        self.score = self.base_score
+        self.pending_marks = []     # aging marks (in minutes) this customer has not reached yet
+        self.display_cache = None   # pre-rendered display row, dropped whenever the score changes
+
+    def sort_key(self):
+        # Highest score first, then earliest arrival, then id as a stable tie-breaker.
+        return (-self.score, self.arrival_timestamp, self.id)
+
+
+class ServiceLane:
+    # One heap of (-score, arrival_timestamp, customer id) with its own lock, so
+    # counters handling different services don't wait on each other.
+    __slots__ = ('heap', 'lock')
+
+    def __init__(self):
+        self.heap = []
+        self.lock = threading.Lock()
+
+
+class WaitTimedLock:
+    """
+    A threading.Lock that keeps track of how often callers found it taken and
+    how long they waited in total. When the lock is free, the only extra cost
+    is one non-blocking try, so this is cheap enough to leave on.
+    The counts are only updated while the lock is held.
+    """
+    __slots__ = ('_lock', 'acquired', 'contended', 'wait_seconds')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+
+    def __enter__(self):
+        lock = self._lock
+        if not lock.acquire(False):
+            started = time.perf_counter()
+            lock.acquire()
+            self.contended += 1
+            self.wait_seconds += time.perf_counter() - started
+        self.acquired += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+# --- The In-Memory Priority Queue ---
+class PriorityQueue:
+    """
+    A max-priority queue whose scores grow with waiting time.
+
+    Instead of re-checking everybody's score when we serve someone, every entry
+    has its next aging mark scheduled in a second heap (ordered by the time it
+    is due). Before answering, the queue applies all marks that are already due,
+    so the heaps always hold the true current scores. Each customer can only
+    cross a handful of marks, so push/pop stay O(log n) amortized and never
+    touch the database.
+
+    Customers are kept in one heap per service lane. pop(services=...) looks at
+    the top of each lane the counter handles, picks the best, and claims it
+    under the main lock, which only guards a dictionary delete. Lane heaps have
+    their own locks, and a customer claimed through one lane is skipped lazily
+    in the others, so several counters can serve at the same time.
+
+    `version` goes up on every change (add, serve, remove, aging), so callers
+    can cache anything derived from the queue and only rebuild it when the
+    version moves. Listeners registered with add_listener() are told about each
+    change as it happens, as ('add' | 'remove' | 'rescore', entry).
+    """
+
+    def __init__(self, clock=datetime.datetime.now, aging=DEFAULT_AGING):
+        self.clock = clock                # what "now" means when a caller doesn't say
+        self.aging = aging                # AgingRules; the simulator tries other ones
+        self._marks = {}                  # category -> aging_marks() under these rules, looked up by category alone
+        self._entries = {}                # customer id -> QueueEntry
+        self._lanes = {ALL_SERVICES: ServiceLane()}
+        self._live_lane_items = 0         # heap items across all lanes that belong to waiting customers
+        self._aging_events = []           # (due datetime, sequence, QueueEntry)
+        self._sequence = itertools.count()
+        self._view = []                   # entries in display order as of _view_version
+        self._view_added = []             # entries pushed since the view was last repaired
+        self._view_version = 0
+        self.version = 0
+        self._listeners = []
+        # Guards the entries, the aging schedule and the view. Lock order is always
+        # this lock first, then a lane lock; never the other way round.
+        self._lock = WaitTimedLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, customer_id):
+        return customer_id in self._entries
+
+    def add_listener(self, callback):
+        # Callbacks run while the queue is locked, so they must be quick and must not call back into it.
+        self._listeners.append(callback)
+
+    def push(self, customer_obj, now=None):
+        # Accepts anything shaped like a Customer (an ORM object, a DB row, or a plain record).
+        now = now or self.clock()
+        entry = QueueEntry(customer_obj)
+        wait_minutes = wait_minutes_at(entry.arrival_timestamp, now)
+        entry.score = entry.base_score + aging_bonus(entry.category, wait_minutes, self.aging)
+        # Only keep the marks still ahead of us, soonest last so we can pop() them off the end.
+        entry.pending_marks = [m for m in reversed(self._aging_marks(entry.category)) if m > wait_minutes]
+        with self._lock:
+            replaced = self._entries.get(entry.id)
+            if replaced is not None:
+                self._live_lane_items -= len(replaced.lanes)
+            self._entries[entry.id] = entry
+            self._live_lane_items += len(entry.lanes)
+            self._push_to_lanes(entry)
+            self._schedule_next_mark(entry)
+            self._view_added.append(entry)
+            self.version += 1
+            self._notify('add', entry)
+        return entry
+
+    def load(self, customer_objs, now=None):
+        """
+        Replaces the whole queue with these customers in one go (used at start-up).
+        Building the lists and heapifying them once is O(n), much cheaper than n
+        pushes. Listeners are not told about each customer; the version still moves.
+        """
+        now = now or self.clock()
+        entries = {}
+        keys_by_lanes = {}     # lanes tuple -> heap keys of the customers waiting in exactly those lanes
+        aging_events = []
+        # Everyone in the same category who has waited the same whole minutes gets the
+        # same bonus and the same marks ahead, so each pair is only worked out once.
+        aging_by_wait = {}     # (category, minutes waited) -> (bonus, marks ahead soonest last, next mark's offset)
+        sequence = self._sequence
+        for customer_obj in customer_objs:
+            entry = QueueEntry(customer_obj)
+            arrival = entry.arrival_timestamp
+            wait = (entry.category, wait_minutes_at(arrival, now))
+            aging = aging_by_wait.get(wait)
+            if aging is None:
+                aging = aging_by_wait[wait] = self._aging_at(*wait)
+            bonus, pending, offset = aging
+            entry.score = score = entry.base_score + bonus
+            entries[entry.id] = entry
+            keys = keys_by_lanes.get(entry.lanes)
+            if keys is None:
+                keys = keys_by_lanes[entry.lanes] = []
+            keys.append((-score, arrival, entry.id))
+            if pending:
+                entry.pending_marks = list(pending)
+                aging_events.append((arrival + offset, next(sequence), entry))
+        keys_by_lane = {ALL_SERVICES: []}
+        for lanes, keys in keys_by_lanes.items():
+            for name in lanes:
+                keys_by_lane.setdefault(name, []).extend(keys)
+        for keys in keys_by_lane.values():
+            heapq.heapify(keys)
+        heapq.heapify(aging_events)
+        with self._lock:
+            self._entries = entries
+            self._live_lane_items = sum(len(keys) for keys in keys_by_lane.values())
+            for name, keys in keys_by_lane.items():
+                lane = self._lanes.get(name)
+                if lane is None:
+                    lane = self._lanes[name] = ServiceLane()
+                with lane.lock:
+                    lane.heap = keys
+            for name, lane in self._lanes.items():
+                if name not in keys_by_lane:
+                    with lane.lock:
+                        lane.heap = []
+            self._aging_events = aging_events
+            self._view = []
+            self._view_added = list(entries.values())
+            self.version += 1
+        return len(entries)
+
+    def pop(self, now=None, services=None):
+        """
+        Removes and returns the QueueEntry with the highest current score among
+        customers asking for any of `services` (or anybody, if services is empty),
+        or None if no one matches.
+        """
+        now = now or self.clock()
+        self._apply_due_aging_if_needed(now)
+        lane_names = lanes_for_counter(services)
+        while True:
+            best_key = self._best_key(lane_names)
+            if best_key is None:
+                return None
+            with self._lock:
+                entry = self._entries.get(best_key[2])
+                if entry is None or entry.score != -best_key[0]:
+                    continue  # another counter claimed them (or they aged) in the meantime
+                del self._entries[entry.id]
+                self._live_lane_items -= len(entry.lanes)
+                self.version += 1
+                self._notify('remove', entry)
+                self._maybe_compact()
+                return entry
+
+    def remove(self, customer_id):
+        # Drops a customer from the queue; their heap items are cleaned up lazily.
+        with self._lock:
+            entry = self._entries.pop(customer_id, None)
+            if entry is not None:
+                self._live_lane_items -= len(entry.lanes)
+                self.version += 1
+                self._notify('remove', entry)
+                self._maybe_compact()
+            return entry
+
+    def advance(self, now=None):
+        # Applies any aging marks that are due. Returns the entries whose score changed.
+        now = now or self.clock()
+        with self._lock:
+            return self._apply_due_aging(now)
+
+    def next_aging_time(self):
+        # When the next score change is due (or None if no one is going to age any more).
+        with self._lock:
+            while self._aging_events:
+                due, _seq, entry = self._aging_events[0]
+                if self._entries.get(entry.id) is entry:
+                    return due
+                heapq.heappop(self._aging_events)
+            return None
+
+    def ordered_entries(self, now=None):
+        # Returns (version, waiting entries from highest to lowest priority).
+        # The order is repaired from the previous one rather than rebuilt: we drop
+        # whoever left, append whoever arrived and let Timsort fix the few entries
+        # that moved, which is close to linear because the list is almost sorted.
+        now = now or self.clock()
+        with self._lock:
+            self._apply_due_aging(now)
+            if self._view_version != self.version:
+                live = self._entries
+                view = [entry for entry in self._view if live.get(entry.id) is entry]
+                view.extend(entry for entry in self._view_added if live.get(entry.id) is entry)
+                view.sort(key=QueueEntry.sort_key)
+                self._view = view
+                self._view_added = []
+                self._view_version = self.version
+            return self.version, list(self._view)
+
+    def stats(self):
+        # Sizes and lock contention for monitoring. Read without the lock, so the
+        # numbers can be a moment apart, but a scrape never holds up a serve.
+        lock = self._lock
+        return {
+            "waiting": len(self._entries),
+            "lane_heap_items": sum(len(lane.heap) for lane in list(self._lanes.values())),
+            "live_lane_items": self._live_lane_items,
+            "aging_events": len(self._aging_events),
+            "lock_acquired": lock.acquired,
+            "lock_contended": lock.contended,
+            "lock_wait_seconds": lock.wait_seconds,
+        }
+
+    def count_ahead(self, customer_id, lane_names, now=None):
+        # How many waiting customers in any of these lanes rank above this one,
+        # or None if they aren't waiting. The lock is only held to apply aging and
+        # copy the entries; the pass over them runs outside it, so a long queue
+        # doesn't hold up serves. It is an estimate, so a score that changes
+        # during the pass doesn't matter.
+        now = now or self.clock()
+        lane_names = frozenset(lane_names)
+        with self._lock:
+            self._apply_due_aging(now)
+            entry = self._entries.get(customer_id)
+            if entry is None:
+                return None
+            others = list(self._entries.values())
+        score, tie = entry.score, (entry.arrival_timestamp, entry.id)
+        ahead = 0
+        for other in others:
+            other_score = other.score
+            if other_score > score or (other_score == score and (other.arrival_timestamp, other.id) < tie):
+                if not lane_names.isdisjoint(other.lanes):
+                    ahead += 1
+        return ahead
+
+    def get_all_item_ids(self):
+        # Returns a list of all customer IDs currently waiting in the queue.
+        with self._lock:
+            return list(self._entries)
+
+    def _aging_at(self, category, wait_minutes):
+        # (bonus, marks still ahead soonest last, time from arrival to the next one) for load().
+        pending = tuple(m for m in reversed(self._aging_marks(category)) if m > wait_minutes)
+        offset = datetime.timedelta(minutes=pending[-1]) if pending else None
+        return aging_bonus(category, wait_minutes, self.aging), pending, offset
+
+    def _aging_marks(self, category):
+        # Hashing the rules for aging_marks()' cache on every push would cost more than the lookup saves.
+        marks = self._marks.get(category)
+        if marks is None:
+            marks = self._marks[category] = aging_marks(category, self.aging)
+        return marks
+
+    # --- Lane helpers (no main lock needed) ---
+
+    def _is_live(self, key):
+        entry = self._entries.get(key[2])
+        return entry is not None and entry.score == -key[0]
+
+    def _best_key(self, lane_names):
+        # The best live heap item at the top of the given lanes, dropping dead ones on the way.
+        best = None
+        for name in lane_names:
+            lane = self._lanes.get(name)
+            if lane is None:
+                continue
+            with lane.lock:
+                heap = lane.heap
+                while heap and not self._is_live(heap[0]):
+                    heapq.heappop(heap)
+                if heap and (best is None or heap[0] < best):
+                    best = heap[0]
+        return best
+
+    def _apply_due_aging_if_needed(self, now):
+        # Peeking at the top of the schedule is cheap; only take the main lock if something is due.
+        events = self._aging_events
+        if events and events[0][0] <= now:
+            with self._lock:
+                self._apply_due_aging(now)
+
+    # --- Internal helpers (caller must hold self._lock) ---
+
+    def _notify(self, change, entry):
+        for callback in self._listeners:
+            callback(change, entry)
+
+    def _push_to_lanes(self, entry):
+        key = entry.sort_key()
+        for name in entry.lanes:
+            lane = self._lanes.get(name)
+            if lane is None:
+                lane = self._lanes[name] = ServiceLane()
+            with lane.lock:
+                heapq.heappush(lane.heap, key)
+
+    def _schedule_next_mark(self, entry):
+        if entry.pending_marks:
+            due = entry.arrival_timestamp + datetime.timedelta(minutes=entry.pending_marks[-1])
+            heapq.heappush(self._aging_events, (due, next(self._sequence), entry))
+
+    def _apply_due_aging(self, now):
+        changed = []
+        events = self._aging_events
+        while events and events[0][0] <= now:
+            _due, _seq, entry = heapq.heappop(events)
+            if self._entries.get(entry.id) is not entry:
+                continue  # served or removed since this was scheduled
+            mark = entry.pending_marks.pop()
+            new_score = entry.base_score + aging_bonus(entry.category, mark, self.aging)
+            if new_score != entry.score:
+                entry.score = new_score
+                entry.display_cache = None
+                # The old heap items stay behind and are skipped once they no longer match.
+                self._push_to_lanes(entry)
+                changed.append(entry)
+                self.version += 1
+                self._notify('rescore', entry)
+            self._schedule_next_mark(entry)
+        return changed
+
+    def _maybe_compact(self):
+        # Skipped items pile up after removals and score changes. When they clearly
+        # outnumber the live ones, rebuild the heaps from the live entries only.
+        live = self._entries
+        if len(self._view_added) > 2 * len(live) + 64:
+            # Nobody has asked for the display order in a while; start it over from scratch.
+            self._view = []
+            self._view_added = list(live.values())
+        lane_items = sum(len(lane.heap) for lane in self._lanes.values())
+        if lane_items > 2 * self._live_lane_items + 64:
+            keys_by_lane = {name: [] for name in self._lanes}
+            for entry in live.values():
+                key = entry.sort_key()
+                for name in entry.lanes:
+                    keys_by_lane[name].append(key)
+            for name, lane in self._lanes.items():
+                with lane.lock:
+                    lane.heap = keys_by_lane[name]
+                    heapq.heapify(lane.heap)
+            self._aging_events = [event for event in self._aging_events if live.get(event[2].id) is event[2]]
+            heapq.heapify(self._aging_events)
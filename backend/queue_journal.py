@@ -0,0 +1,212 @@
+import collections
+import datetime
+import glob
+import json
+import os
+import threading
+
+# What we keep on disk for each waiting customer: exactly what PriorityQueue.push()
+# reads, so a restored record can go straight back into the queue.
+QueueRecord = collections.namedtuple('QueueRecord', [
+    'id', 'queue_number', 'name', 'category', 'service', 'urgency',
+    'initial_priority_score', 'arrival_timestamp'])
+
+SNAPSHOT_FILE = 'queue.snapshot.json'
+LOG_PATTERN = 'queue.log.*'
+
+
+def entry_to_tuple(entry):
+    # QueueRecord fields as a plain tuple. Scores are not stored because aging is
+    # recomputed from the arrival time.
+    return (entry.id, entry.queue_number, entry.name, entry.category, entry.service,
+            entry.urgency, entry.base_score, entry.arrival_timestamp)
+
+
+def tuple_to_row(fields):
+    # The same fields as a JSON array, for the log.
+    return list(fields[:7]) + [fields[7].isoformat()]
+
+
+def row_to_tuple(row):
+    return tuple(row[:7]) + (datetime.datetime.fromisoformat(row[7]),)
+
+
+class QueueJournal:
+    """
+    Keeps a copy of the waiting queue on disk so a restart doesn't have to
+    rebuild it from the customers table.
+
+    The copy is a snapshot of every waiting customer (JSON, one array per
+    customer like the log's add lines) plus an append-only log of the adds and
+    removals since. Both are plain data rather than pickles: the directory can
+    be moved with AYOSPILA_QUEUE_STATE_DIR, and unpickling a file planted there
+    would run code at start-up. Every checkpoint starts a new log generation
+    and then writes a fresh snapshot, so the log never grows past one interval.
+    Log lines are plain JSON and are only flushed, not fsynced, which keeps
+    record() cheap enough to run while the queue is locked; the caller checks
+    the restored queue against the database anyway, so a line lost in an OS
+    crash just gets picked up from there.
+
+    Replaying is safe even when the snapshot already includes some of the log:
+    an add puts the customer, a removal drops them, so applying the tail again
+    lands on the same state.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()              # guards the open log file
+        self._checkpoint_lock = threading.Lock()   # one checkpoint at a time
+        self._log = None
+        self.generation = 0
+        self.checkpoint_version = None   # queue version at the last checkpoint
+
+    def _log_path(self, generation):
+        return os.path.join(self.directory, f"queue.log.{generation}")
+
+    def _log_generations(self):
+        generations = []
+        for path in glob.glob(os.path.join(self.directory, LOG_PATTERN)):
+            suffix = path.rsplit('.', 1)[1]
+            if suffix.isdigit():
+                generations.append(int(suffix))
+        return sorted(generations)
+
+    def restore(self):
+        """
+        Reads the snapshot and replays the logs written after it. Returns the
+        waiting customers as QueueRecords, or None if there is nothing on disk.
+        """
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(snapshot_path):
+            return None
+        with open(snapshot_path, encoding='utf-8') as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        generation = snapshot['generation']
+        rows = snapshot['entries']
+        parse_time = datetime.datetime.fromisoformat
+        for row in rows:
+            row[7] = parse_time(row[7])  # in place: a new tuple per customer costs more than the parse
+        records = {row[0]: row for row in rows}
+        for log_generation in self._log_generations():
+            if log_generation < generation:
+                continue
+            with open(self._log_path(log_generation), encoding='utf-8') as log_file:
+                for line in log_file:
+                    try:
+                        change = json.loads(line)
+                    except ValueError:
+                        break  # a line cut short by a crash; nothing after it was written
+                    if change[0] == 'add':
+                        records[change[1][0]] = row_to_tuple(change[1])
+                    else:
+                        records.pop(change[1], None)
+            generation = max(generation, log_generation)
+        self.generation = generation
+        return list(map(QueueRecord._make, records.values()))
+
+    def record(self, change, entry):
+        # Queue listener: runs while the queue is locked, so it only appends a line.
+        if change == 'rescore':
+            return  # scores are recomputed on restore
+        line = ['add', tuple_to_row(entry_to_tuple(entry))] if change == 'add' else ['remove', entry.id]
+        with self._lock:
+            if self._log is not None:
+                self._log.write(json.dumps(line, separators=(',', ':')) + '\n')
+                self._log.flush()
+
+    def start_log(self):
+        # Starts logging into a fresh generation (at start-up, after restore()). The
+        # snapshot on disk plus every log since is still a complete copy.
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._next_log()
+
+    def _next_log(self):
+        # Caller holds self._lock. Skips past any logs left behind, so a new
+        # generation never reuses an old file.
+        self.generation = max([self.generation] + self._log_generations()) + 1
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self._log_path(self.generation), 'w', encoding='utf-8')
+        return self.generation
+
+    def checkpoint(self, queue):
+        """
+        Starts a new log generation, then writes a snapshot of the queue as it is
+        now and deletes the older logs. Changes made while the snapshot is being
+        taken land in the new log, which is replayed on top of it.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self._checkpoint_lock:
+            return self._checkpoint(queue)
+
+    def _checkpoint(self, queue):
+        with self._lock:
+            generation = self._next_log()
+        version, entries = queue.ordered_entries()
+        snapshot = {"generation": generation, "savedAt": datetime.datetime.now().isoformat(),
+                    "entries": [tuple_to_row(entry_to_tuple(entry)) for entry in entries]}
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        temp_path = snapshot_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as snapshot_file:
+            snapshot_file.write(json.dumps(snapshot, separators=(',', ':')))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temp_path, snapshot_path)  # readers see the old snapshot or the new one, never half of one
+        for old_generation in self._log_generations():
+            if old_generation < generation:
+                os.remove(self._log_path(old_generation))
+        self.checkpoint_version = version
+        return len(entries)
+
+    def close(self):
+        # Closes the log. Changes after this aren't recorded; the next start-up reconciles them.
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+class QueueCheckpointer:
+    # Writes a checkpoint every `interval` seconds, but only if the queue changed since the last one.
+    # `reconcile`, if given, runs before each checkpoint after the first (the app checks the queue
+    # against the database with it).
+
+    def __init__(self, journal, queue, interval, reconcile=None):
+        self._journal = journal
+        self._queue = queue
+        self._interval = interval
+        self._reconcile = reconcile
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='queue-checkpointer', daemon=True)
+            self._thread.start()
+
+    def checkpoint_if_changed(self):
+        if self._queue.version != self._journal.checkpoint_version:
+            self._journal.checkpoint(self._queue)
+
+    def _run(self):
+        wait = 0  # the first checkpoint right away, so a start-up from the database gets a snapshot
+        while not self._stop.wait(wait):
+            if wait and self._reconcile is not None:
+                self._reconcile()  # start-up has just done its own check
+            wait = self._interval
+            try:
+                self.checkpoint_if_changed()
+            except OSError as e:
+                # The log keeps recording changes, so the next checkpoint can try again.
+                print(f"Queue checkpoint failed: {e}")
+
+    def stop(self):
+        # At shutdown: ends the loop, writes a last checkpoint if anything changed, and closes the log.
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.checkpoint_if_changed()
+        finally:
+            self._journal.close()
@@ -0,0 +1,252 @@
+"""
+The queue server: one process that owns the live queue when the app runs as
+several workers (see gunicorn.conf.py).
+
+Every worker keeps its database work to itself, but asks this process to add
+customers to the queue, pop the next one for a window, render the /api/queue
+snapshot and record who each window is serving. Because there is only one
+queue, a customer can only be popped once no matter how many workers there
+are. Each worker also keeps one subscription open that relays queue changes
+to the display boards connected to it.
+
+Run on its own (gunicorn.conf.py starts it for you):
+
+    AYOSPILA_QUEUE_AUTHKEY=<secret> python backend/queue_server.py
+"""
+import os
+import signal
+import socket
+import sys
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+# Calls a worker may make. Anything else is refused.
+QUEUE_METHODS = ('push', 'pop', 'snapshot', 'counter', 'counters', 'set_serving', 'predict_wait', 'queue_length',
+                 'metrics_text')
+SUBSCRIBE = 'subscribe'
+SUBSCRIPTION_WAIT_SECONDS = 15
+# How long a new connection has to prove it knows the authkey.
+HANDSHAKE_TIMEOUT_SECONDS = 10
+
+
+def queue_server_address(default_directory):
+    # AYOSPILA_QUEUE_SERVER is "host:port" or the path of a Unix socket.
+    address = os.environ.get('AYOSPILA_QUEUE_SERVER') or os.path.join(default_directory, 'queue.sock')
+    host, separator, port = address.rpartition(':')
+    if separator and port.isdigit() and '/' not in address:
+        return (host, int(port))
+    return address
+
+
+def queue_server_authkey():
+    authkey = os.environ.get('AYOSPILA_QUEUE_AUTHKEY')
+    if not authkey:
+        raise RuntimeError("Set AYOSPILA_QUEUE_AUTHKEY to the secret shared by the queue server and the workers")
+    return authkey.encode()
+
+
+def shut_down_socket(connection):
+    # Wakes up a thread blocked reading from this connection (it gets an EOFError).
+    try:
+        with socket.socket(fileno=os.dup(connection.fileno())) as sock:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # already closed
+
+
+class QueueServer:
+    """
+    Serves a LocalQueueState to the workers. Each connection gets its own thread
+    and handles one call at a time; the queue itself is thread-safe, so calls
+    from different workers run side by side.
+
+    The authkey handshake also runs on the connection's own thread rather than
+    in accept(), so a client with the wrong key, or one that connects and then
+    says nothing, can't hold up the workers or stop the server.
+    """
+
+    def __init__(self, address, authkey, state, broadcaster):
+        self._state = state
+        self._broadcaster = broadcaster
+        self._authkey = authkey
+        if isinstance(address, str) and os.path.exists(address):
+            os.remove(address)  # a socket left behind by a previous run
+        self._listener = Listener(address)  # no authkey: _authenticate() does the handshake
+
+    def serve_forever(self):
+        while True:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                continue  # a client that hung up before we got to it
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _authenticate(self, connection):
+        # The same exchange Listener.accept() does with an authkey, given a deadline.
+        watchdog = threading.Timer(HANDSHAKE_TIMEOUT_SECONDS, shut_down_socket, (connection,))
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            deliver_challenge(connection, self._authkey)
+            answer_challenge(connection, self._authkey)
+        finally:
+            watchdog.cancel()
+
+    def _handle(self, connection):
+        try:
+            self._authenticate(connection)
+        except (AuthenticationError, EOFError, OSError):
+            connection.close()  # wrong key, or too slow to answer
+            return
+        try:
+            while True:
+                method, args = connection.recv()
+                if method == SUBSCRIBE:
+                    self._stream_changes(connection)
+                    return
+                if method not in QUEUE_METHODS:
+                    connection.send(('error', f"Unknown queue method {method!r}"))
+                    continue
+                try:
+                    connection.send(('ok', getattr(self._state, method)(*args)))
+                except Exception as e:  # the worker re-raises it
+                    connection.send(('error', f"{type(e).__name__}: {e}"))
+        except (EOFError, OSError):
+            pass  # the worker went away
+        finally:
+            connection.close()
+
+    def _stream_changes(self, connection):
+        # Sends (first sequence, encoded SSE messages) batches as they are published.
+        # An empty batch now and then lets us notice a worker that has gone away.
+        sequence = self._broadcaster.last_sequence
+        connection.send((sequence + 1, []))
+        while True:
+            result = self._broadcaster.wait_for_messages(sequence, timeout=SUBSCRIPTION_WAIT_SECONDS)
+            if result is None:
+                # This worker fell behind the history; it starts its boards over from a snapshot.
+                sequence = self._broadcaster.last_sequence
+                connection.send((sequence + 1, None))
+                continue
+            first, (sequence, messages) = sequence + 1, result
+            connection.send((first, messages))
+
+
+class RemoteQueueState:
+    """
+    Stands in for LocalQueueState inside a worker: the same methods, each one a
+    call to the queue server. Every thread uses its own connection, since a
+    connection can only carry one call at a time.
+    """
+
+    def __init__(self, address, authkey):
+        self._address = address
+        self._authkey = authkey
+        self._local = threading.local()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot = None    # (body, etag) last fetched from the server
+
+    def _call(self, method, *args):
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            try:
+                if connection is None:
+                    connection = self._local.connection = Client(self._address, authkey=self._authkey)
+                connection.send((method, args))
+            except (OSError, EOFError):
+                # The queue server restarted since we last used this connection; reconnect once.
+                self._local.connection = None
+                if attempt:
+                    raise
+                continue
+            try:
+                status, result = connection.recv()
+                break
+            except (OSError, EOFError):
+                # The call may already have happened (a pop, say), so it is not safe to send it again.
+                self._local.connection = None
+                raise
+        if status == 'error':
+            raise RuntimeError(f"Queue server: {result}")
+        return result
+
+    def push(self, record):
+        return self._call('push', record)
+
+    def pop(self, services):
+        return self._call('pop', services)
+
+    def snapshot(self):
+        # The server only sends the body when it changed since the version we have.
+        known = self._snapshot
+        fresh = self._call('snapshot', known[1] if known else None)
+        if fresh is None:
+            return known
+        with self._snapshot_lock:
+            self._snapshot = fresh
+        return fresh
+
+    def counter(self, counter_id=None):
+        return self._call('counter', counter_id)
+
+    def counters(self):
+        return self._call('counters')
+
+    def set_serving(self, counter_id, customer_id, card, at=None):
+        return self._call('set_serving', counter_id, customer_id, card, at)
+
+    def predict_wait(self, customer_id, service):
+        return self._call('predict_wait', customer_id, service)
+
+    def queue_length(self):
+        return self._call('queue_length')
+
+    def metrics_text(self):
+        return self._call('metrics_text')
+
+
+class QueueRelay:
+    # Copies queue changes from the queue server into this worker's broadcaster,
+    # so its /api/queue/stream connections see every change no matter which worker made it.
+
+    def __init__(self, address, authkey, broadcaster):
+        self._address = address
+        self._authkey = authkey
+        self._broadcaster = broadcaster
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='queue-relay', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with Client(self._address, authkey=self._authkey) as connection:
+                    connection.send((SUBSCRIBE, ()))
+                    while True:
+                        first_sequence, messages = connection.recv()
+                        self._broadcaster.relay(first_sequence, messages)
+            except (OSError, EOFError, AuthenticationError):
+                # Lost the queue server (or reached something else with a different key);
+                # boards are sent a fresh snapshot once we're back.
+                threading.Event().wait(1)
+
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as app_module
+
+    address = queue_server_address(app_module.QUEUE_STATE_DIR)
+    server = QueueServer(address, queue_server_authkey(), app_module.LocalQueueState(), app_module.queue_broadcaster)
+    app_module.initialize_queue()
+    # Exit normally on SIGTERM, so the final checkpoint (an atexit hook) still gets written.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Queue server listening on {address}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import collections
+import json
+import threading
+
+
+def format_sse(event, data, event_id=None):
+    # One Server-Sent Events message. `data` is already-encoded JSON.
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class QueueBroadcaster:
+    """
+    Fans queue changes out to every open /api/queue/stream connection.
+
+    Each change is encoded exactly once and appended to a short history with a
+    sequence number. Subscribers remember the last number they sent and sleep on
+    a shared condition until something newer shows up, so an idle display board
+    costs a parked thread and nothing else. A board that falls further behind
+    than the history goes back to a full snapshot.
+    """
+
+    def __init__(self, history=512):
+        self._condition = threading.Condition()
+        self._messages = collections.deque(maxlen=history)  # (sequence, encoded SSE message)
+        self.last_sequence = 0
+
+    def publish(self, event, payload):
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        with self._condition:
+            self.last_sequence += 1
+            self._messages.append((self.last_sequence, format_sse(event, data, self.last_sequence)))
+            self._condition.notify_all()
+
+    def relay(self, first_sequence, messages):
+        """
+        Appends messages that were already numbered and encoded by another
+        broadcaster (a worker mirroring the queue server). A gap, or None for
+        messages, means some were missed, so the history is dropped and every
+        subscriber starts over from a snapshot.
+        """
+        with self._condition:
+            if messages is None or first_sequence != self.last_sequence + 1:
+                self._messages.clear()
+                self.last_sequence = first_sequence - 1
+                self._condition.notify_all()
+            for message in messages or ():
+                self.last_sequence += 1
+                self._messages.append((self.last_sequence, message))
+            if messages:
+                self._condition.notify_all()
+
+    def wait_for_messages(self, after_sequence, timeout):
+        """
+        Blocks until there are messages newer than `after_sequence` or `timeout` runs out.
+        Returns (last sequence, list of messages), with an empty list on timeout, or
+        None if the subscriber missed messages that are no longer in the history.
+        """
+        with self._condition:
+            if self.last_sequence == after_sequence:
+                self._condition.wait(timeout)
+            if self.last_sequence == after_sequence:
+                return after_sequence, []
+            if not self._messages or self._messages[0][0] > after_sequence + 1:
+                return None
+            newer = [message for sequence, message in self._messages if sequence > after_sequence]
+            return self.last_sequence, newer
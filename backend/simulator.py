@@ -0,0 +1,272 @@
+"""
+Queue-time simulator and wait-time estimates.
+
+simulate() plays a day of arrivals through the real PriorityQueue and a set of
+windows, each calling the next customer it can serve as soon as it is free.
+Customers are scored with initial_priority_score() and aged by the queue
+itself, so a run ranks people exactly as the live queue would; only the
+weights and aging rules passed in change. That makes it the place to try new
+weights before anyone waits under them:
+
+    flask --app app simulate --date 2026-03-02 --aging 30:5,20:3,10:1 --weights PWD=6,urgency=3
+    flask --app app simulate --synthetic 2000 --windows 6
+
+A day can be replayed from the customers table (arrivals, what each customer
+asked for and how long they were at the window) or generated by
+synthetic_day(). Every step is one O(log n) queue operation with no I/O, so a
+day of a few thousand customers takes tens of milliseconds
+(benchmarks/bench_simulator.py).
+
+The same module estimates waits for the live queue: predict_wait_seconds()
+counts who is ahead of a customer for the windows that can serve them and
+divides by how fast those windows have been getting through people lately.
+simulate(predict=True) makes that estimate at every arrival too, and reports
+how far off it was.
+"""
+import collections
+import datetime
+import heapq
+import math
+import threading
+
+from queue_engine import (PriorityQueue, SCORE_WEIGHTS, DEFAULT_AGING, ScoreWeights,
+                          initial_priority_score, lanes_for_customer, lanes_for_counter)
+from queue_journal import QueueRecord
+
+# Used for estimates until some service times are known (a fresh install).
+DEFAULT_SERVICE_SECONDS = 300
+# How many of the latest services the rolling mean covers.
+SERVICE_TIME_WINDOW = 50
+
+# The mix of people a synthetic day brings in.
+CATEGORY_MIX = {"Regular": 0.70, "Senior Citizen": 0.15, "PWD": 0.08, "Pregnant": 0.07}
+URGENCY_WEIGHTS = [40, 25, 18, 10, 7]   # urgency 1..5
+APPOINTMENT_RATE = 0.25
+SERVICES = ["Driver's License Renewal", "New Driver's License", "Student Permit",
+            "Vehicle Registration", "Plate Release", "Change of Ownership"]
+MULTI_SERVICE_RATE = 0.15
+
+# One customer to simulate. `service_seconds` is how long they take at the window.
+SimulatedCustomer = collections.namedtuple('SimulatedCustomer', (
+    'id', 'category', 'service', 'urgency', 'has_appointment', 'arrival_timestamp', 'service_seconds'))
+
+
+class ServiceTimes:
+    # Rolling mean of the most recent times at the window, in seconds.
+
+    def __init__(self, size=SERVICE_TIME_WINDOW):
+        self._lock = threading.Lock()
+        self._recent = collections.deque(maxlen=size)
+        self._total = 0.0
+
+    def add(self, seconds):
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                self._total -= self._recent[0]
+            self._recent.append(seconds)
+            self._total += seconds
+
+    def mean(self):
+        with self._lock:
+            return self._total / len(self._recent) if self._recent else DEFAULT_SERVICE_SECONDS
+
+
+def estimate_wait_seconds(ahead, windows, mean_service_seconds, window_free=False):
+    # The people ahead are called `windows` at a time, and the window that ends up
+    # calling this customer is, on average, halfway through someone else; unless
+    # one of them has nobody at the counter and there are fewer people ahead than
+    # windows, in which case a window is ready for them as soon as it calls them.
+    if window_free and ahead < windows:
+        return ahead * mean_service_seconds / windows
+    return (ahead + 0.5) * mean_service_seconds / windows
+
+
+def predict_wait_seconds(queue, customer_id, service, windows, service_times, now=None, idle=()):
+    """
+    Estimated seconds until a waiting customer is called: how many people rank
+    above them for the windows that can serve them (`windows` is one services
+    tuple per window, `idle` the indexes of those with nobody at the counter),
+    at the recent pace of service. None if they aren't waiting or no window
+    handles what they asked for.
+
+    It takes the queue as it stands, so it can't foresee people who arrive
+    later and outrank them; simulate(predict=True) shows how much that matters.
+    """
+    customer_lanes = lanes_for_customer(service)
+    lanes = set()
+    able = 0
+    window_free = False
+    for index, services in enumerate(windows):
+        window_lanes = lanes_for_counter(services)
+        if set(window_lanes).isdisjoint(customer_lanes):
+            continue
+        able += 1
+        lanes.update(window_lanes)
+        window_free = window_free or index in idle
+    if not able:
+        return None
+    ahead = queue.count_ahead(customer_id, lanes, now)
+    if ahead is None:
+        return None
+    return estimate_wait_seconds(ahead, able, service_times.mean(), window_free)
+
+
+class SimulationResult:
+    def __init__(self, customers, waits, predictions, makespan):
+        self.customers = customers        # id -> SimulatedCustomer
+        self.waits = waits                # id -> seconds from arrival to being called
+        self.predictions = predictions    # id -> estimated seconds at arrival (simulate(predict=True) only)
+        self.makespan = makespan          # when the last customer was done
+
+    def summary(self):
+        """
+        Rows of (group, customers, mean, median, 90th percentile, longest wait),
+        waits in minutes, for everybody and then per category.
+        """
+        groups = collections.defaultdict(list)
+        for customer_id, seconds in self.waits.items():
+            groups[self.customers[customer_id].category].append(seconds / 60)
+        groups = dict(sorted(groups.items()))
+        everybody = [minutes for waits in groups.values() for minutes in waits]
+        return [wait_row(name, waits) for name, waits in [("All", everybody)] + list(groups.items())]
+
+    def prediction_error(self):
+        # (mean absolute error, mean signed error) of the estimates, in minutes. Positive means too long.
+        errors = [(self.predictions[customer_id] - self.waits[customer_id]) / 60
+                  for customer_id in self.predictions if customer_id in self.waits]
+        if not errors:
+            return None
+        return sum(map(abs, errors)) / len(errors), sum(errors) / len(errors)
+
+
+def wait_row(name, waits):
+    waits = sorted(waits)
+    if not waits:
+        return name, 0, 0.0, 0.0, 0.0, 0.0
+    return (name, len(waits), sum(waits) / len(waits), waits[len(waits) // 2],
+            waits[min(len(waits) - 1, int(len(waits) * 0.9))], waits[-1])
+
+
+def simulate(customers, windows, weights=SCORE_WEIGHTS, aging=DEFAULT_AGING, predict=False):
+    """
+    Plays `customers` (SimulatedCustomers) through a PriorityQueue with these
+    aging rules, served by `windows` (one services tuple per window; empty
+    handles everything). Windows start free and call the best customer they
+    can serve whenever they finish one; everybody is served in the end.
+    """
+    arrivals = sorted(customers, key=lambda customer: (customer.arrival_timestamp, customer.id))
+    by_id = {customer.id: customer for customer in arrivals}
+    queue = PriorityQueue(clock=None, aging=aging)
+    service_times = ServiceTimes()
+    waits, predictions = {}, {}
+    busy = []                             # (finishes at, window, service seconds)
+    idle = list(range(len(windows)))      # windows with nobody left to call
+    makespan = None
+
+    def call_next(window, now):
+        entry = queue.pop(now=now, services=windows[window])
+        if entry is None:
+            return False
+        waits[entry.id] = (now - entry.arrival_timestamp).total_seconds()
+        seconds = by_id[entry.id].service_seconds
+        heapq.heappush(busy, (now + datetime.timedelta(seconds=seconds), window, seconds))
+        return True
+
+    index = 0
+    while index < len(arrivals) or busy:
+        if index < len(arrivals) and (not busy or arrivals[index].arrival_timestamp <= busy[0][0]):
+            customer = arrivals[index]
+            index += 1
+            now = customer.arrival_timestamp
+            score = initial_priority_score(customer.category, customer.urgency, customer.has_appointment, weights)
+            queue.push(QueueRecord(customer.id, '', '', customer.category, customer.service, customer.urgency,
+                                   score, now), now=now)
+            if predict:
+                estimate = predict_wait_seconds(queue, customer.id, customer.service, windows, service_times,
+                                                now, idle)
+                if estimate is not None:
+                    predictions[customer.id] = estimate
+            for position, window in enumerate(idle):
+                if call_next(window, now):
+                    del idle[position]
+                    break
+        else:
+            now, window, seconds = heapq.heappop(busy)
+            service_times.add(seconds)
+            makespan = now
+            if not call_next(window, now):
+                idle.append(window)
+    return SimulationResult(by_id, waits, predictions, makespan)
+
+
+def arrival_stream(rng, arrivals, hours):
+    """
+    Yields (seconds after opening, registration payload as the kiosk sends it).
+    Arrivals are Poisson, busiest in the morning: the rate falls linearly to
+    half by closing time.
+    """
+    mean_rate = arrivals / (hours * 3600)
+    moment = 0.0
+    for i in range(arrivals):
+        progress = min(moment / (hours * 3600), 1.0)
+        rate = mean_rate * (4 / 3) * (1 - progress / 2)
+        moment += rng.expovariate(rate)
+        yield moment, random_registration(rng, i)
+
+
+def random_registration(rng, number, services=SERVICES):
+    # One registration payload drawn from the day's mix of people.
+    services = rng.sample(services, min(len(services), 2 if rng.random() < MULTI_SERVICE_RATE else 1))
+    return {
+        "fullName": f"Load Customer {number}",
+        "category": rng.choices(list(CATEGORY_MIX), weights=list(CATEGORY_MIX.values()))[0],
+        "urgency": rng.choices(range(1, 6), weights=URGENCY_WEIGHTS)[0],
+        "services": services,
+        "appointment": {"status": "yes" if rng.random() < APPOINTMENT_RATE else "no"},
+    }
+
+
+def random_record(rng, customer_id, arrival, services=SERVICES, weights=SCORE_WEIGHTS):
+    # A waiting customer as a QueueRecord, scored the way registration scores them (for the queue benchmarks).
+    payload = random_registration(rng, customer_id, services)
+    category = payload["category"]
+    score = initial_priority_score(category, payload["urgency"], payload["appointment"]["status"] == "yes", weights)
+    return QueueRecord(customer_id, f"{category[:1]}-{customer_id:03d}", payload["fullName"], category,
+                       ", ".join(payload["services"]), payload["urgency"], score, arrival)
+
+
+def synthetic_day(rng, arrivals, hours=8, service_minutes=6, opening=datetime.datetime(2026, 1, 5, 8, 0)):
+    # A generated day of SimulatedCustomers, with log-normal service times (sigma 0.5) of this mean.
+    service_mu = math.log(service_minutes * 60) - 0.125
+    return [SimulatedCustomer(i, payload["category"], ", ".join(payload["services"]), payload["urgency"],
+                              payload["appointment"]["status"] == "yes",
+                              opening + datetime.timedelta(seconds=moment), rng.lognormvariate(service_mu, 0.5))
+            for i, (moment, payload) in enumerate(arrival_stream(rng, arrivals, hours))]
+
+
+def parse_aging(steps_text, regular_text=None, base=DEFAULT_AGING):
+    # "30:5,20:3,10:1" (minutes:points) and "25:3" for the Regular boost, over `base`.
+    rules = base
+    if steps_text:
+        steps = [tuple(int(part) for part in step.split(':')) for step in steps_text.split(',') if step.strip()]
+        rules = rules._replace(steps=tuple(sorted(steps, reverse=True)))
+    if regular_text:
+        minutes, points = (int(part) for part in regular_text.split(':'))
+        rules = rules._replace(regular_minutes=minutes, regular_bonus=points)
+    return rules
+
+
+def parse_weights(text, base=SCORE_WEIGHTS):
+    # "PWD=6,Senior Citizen=4,urgency=3,appointment=2": category points and the two multipliers, over `base`.
+    category_points = dict(base.category_points)
+    weights = {"urgency": base.urgency, "appointment": base.appointment}
+    for item in (text or '').split(','):
+        if not item.strip():
+            continue
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if name in weights:
+            weights[name] = int(value)
+        else:
+            category_points[name] = int(value)
+    return ScoreWeights(category_points, **weights)
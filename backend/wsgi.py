@@ -0,0 +1,10 @@
+"""
+Production entry point: `gunicorn -c gunicorn.conf.py wsgi:app` from backend/.
+
+Every worker process loads the app, then hands the live queue over to the
+queue server (queue_server.py), which gunicorn.conf.py starts before the
+workers. `python app.py` still runs everything in one process for development.
+"""
+from app import app, use_queue_server
+
+use_queue_server()
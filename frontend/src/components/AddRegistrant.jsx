@@ -64,7 +64,11 @@ function AddRegistrant() {
       const result = await response.json();
 
       if (response.ok) {
-        alert(`Successfully registered ${result.customer.fullName} with queue number ${result.customer.queueNumber}!`);
+        const { estimatedWaitMinutes } = result.customer;
+        const waitNote = estimatedWaitMinutes == null ? ''
+          : estimatedWaitMinutes === 0 ? " You'll be called shortly."
+          : ` Estimated wait: about ${estimatedWaitMinutes} min.`;
+        alert(`Successfully registered ${result.customer.fullName} with queue number ${result.customer.queueNumber}!${waitNote}`);
         // If you want to navigate away after success, you'll need the prop from App.jsx
         // onRegistrationSuccess(); 
       } else {
@@ -1,22 +1,59 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './QueueStatus.css';
 
+// Same order the server uses: highest score first, then whoever arrived first.
+const byPriority = (a, b) => {
+  if (a.priority.score !== b.priority.score) return b.priority.score - a.priority.score;
+  if (a.arrivalTimestamp !== b.arrivalTimestamp) return a.arrivalTimestamp < b.arrivalTimestamp ? -1 : 1;
+  return a.id < b.id ? -1 : a.id > b.id ? 1 : 0;
+};
+
 function QueueStatus() {
   const API_BASE_URL = 'http://192.168.68.104:5001';
   
   const [currentlyServing, setCurrentlyServing] = useState(null);
-  const [antiStarvationAlerts, setAntiStarvationAlerts] = useState([]);
+  const [counters, setCounters] = useState([]);
+  // Which window this screen serves from; remembered per browser.
+  const [counterId, setCounterId] = useState(() => {
+    const saved = window.localStorage.getItem('counterId');
+    return saved ? Number(saved) : null;
+  });
   const [queueData, setQueueData] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
+  const [now, setNow] = useState(Date.now());
+  // The server only sends a new queue when something changed (the browser revalidates
+  // with the ETag for us), so we remember which version we have already shown.
+  const lastEtag = useRef(null);
+  // Difference between the server clock and ours, used to work out wait times locally.
+  const clockOffset = useRef(0);
+  // True while the live stream is connected; polling is only the fallback.
+  const isStreaming = useRef(false);
+
+  const setServerTime = (serverTime) => {
+    if (serverTime) {
+      clockOffset.current = Date.parse(serverTime) - Date.now();
+    }
+  };
+
+  const applySnapshot = (data) => {
+    setCurrentlyServing(data.currentlyServing);
+    setCounters(data.counters || []);
+    setQueueData(data.queue);
+    setIsLoading(false);
+  };
 
   const fetchQueueData = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/api/queue`);
+      setServerTime(response.headers.get('X-Server-Time'));
+      const etag = response.headers.get('ETag');
+      if (response.ok && etag && etag === lastEtag.current) {
+        return; // Nothing changed since the last poll
+      }
       const data = await response.json();
       if (response.ok) {
-        setCurrentlyServing(data.currentlyServing);
-        setAntiStarvationAlerts(data.antiStarvationAlerts);
-        setQueueData(data.queue);
+        lastEtag.current = etag;
+        applySnapshot(data);
       } else {
         throw new Error(data.error || 'Failed to fetch queue data');
       }
@@ -27,13 +64,22 @@ function QueueStatus() {
     }
   };
   
-  const handleServeNext = async () => {
+  const chooseCounter = (id) => {
+    setCounterId(id);
+    window.localStorage.setItem('counterId', String(id));
+  };
+
+  const handleServeNext = async (targetCounterId) => {
     try {
       const response = await fetch(`${API_BASE_URL}/api/queue/serve-next`, {
         method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(targetCounterId ? { counterId: targetCounterId } : {}),
       });
       if (response.ok) {
-        fetchQueueData(); // Immediately refresh data after serving
+        if (!isStreaming.current) {
+          fetchQueueData(); // Immediately refresh data after serving (the stream does this for us)
+        }
       } else {
         const result = await response.json();
         throw new Error(result.error || 'Failed to serve next customer');
@@ -46,13 +92,75 @@ function QueueStatus() {
 
   // useEffect is where you'll fetch data from your backend
   useEffect(() => {
-    fetchQueueData(); // Fetch data once immediately on load
-    const intervalId = setInterval(fetchQueueData, 5000); // Then, fetch again every 5 seconds
+    const clockId = setInterval(() => setNow(Date.now()), 15000); // Keep wait times ticking
+    let intervalId = null;
+    let source = null;
+
+    const startPolling = () => {
+      if (intervalId === null) {
+        fetchQueueData(); // Fetch data once immediately
+        intervalId = setInterval(fetchQueueData, 5000); // Then, fetch again every 5 seconds
+      }
+    };
+    const stopPolling = () => {
+      clearInterval(intervalId);
+      intervalId = null;
+    };
+
+    if (window.EventSource) {
+      // The server pushes one snapshot, then a small event for every change.
+      source = new EventSource(`${API_BASE_URL}/api/queue/stream`);
+      source.addEventListener('snapshot', (event) => {
+        isStreaming.current = true;
+        stopPolling();
+        applySnapshot(JSON.parse(event.data));
+      });
+      source.addEventListener('clock', (event) => setServerTime(JSON.parse(event.data).serverTime));
+      const upsert = (event) => {
+        const row = JSON.parse(event.data);
+        setQueueData(queue => [...queue.filter(c => c.id !== row.id), row].sort(byPriority));
+      };
+      source.addEventListener('add', upsert);
+      source.addEventListener('priority', upsert);
+      source.addEventListener('remove', (event) => {
+        const { id } = JSON.parse(event.data);
+        setQueueData(queue => queue.filter(c => c.id !== id));
+      });
+      source.addEventListener('serving', (event) => {
+        // One window changed who it is serving.
+        const counter = JSON.parse(event.data);
+        setCounters(list => list.map(c => (c.id === counter.id ? counter : c)));
+        if (counter.serving) setCurrentlyServing(counter.serving);
+      });
+      source.onerror = () => {
+        // EventSource keeps retrying on its own; poll in the meantime so the board stays fresh.
+        isStreaming.current = false;
+        startPolling();
+      };
+    } else {
+      startPolling();
+    }
     
-    // This is a cleanup function that stops the timer when you leave the page
-    return () => clearInterval(intervalId); 
+    // This is a cleanup function that stops the stream and timers when you leave the page
+    return () => {
+      if (source) source.close();
+      stopPolling();
+      clearInterval(clockId);
+    };
   }, []); // The empty array [] means this setup runs only once
 
+  // This screen's window, or the first one if none was picked (or it no longer exists).
+  const myCounter = counters.find(c => c.id === counterId) || counters[0];
+  const servingCard = myCounter ? myCounter.serving : currentlyServing;
+
+  // Alerts travel with each customer's row, so they stay in step with the queue.
+  const antiStarvationAlerts = queueData.filter(customer => customer.alert).map(customer => customer.alert);
+
+  const getWaitTime = (arrivalTimestamp) => {
+    const waitedMs = now + clockOffset.current - Date.parse(arrivalTimestamp);
+    return Math.max(0, Math.floor(waitedMs / 60000));
+  };
+
   const getPriorityClass = (priority) => {
     if (!priority) return '';
     switch (priority.toLowerCase()) {
@@ -71,18 +179,28 @@ function QueueStatus() {
     <div className="queue-status-page-container">
       <div className="currently-serving-card">
         <h3 className="card-title">Currently Serving</h3>
+        {counters.length > 1 && (
+          <select className="counter-select" value={myCounter ? myCounter.id : ''}
+                  onChange={(e) => chooseCounter(Number(e.target.value))}>
+            {counters.map(c => (
+              <option key={c.id} value={c.id}>
+                {c.name}{c.services.length ? ` (${c.services.join(', ')})` : ''}
+              </option>
+            ))}
+          </select>
+        )}
         {isLoading ? (
           <p>Loading...</p>
-        ) : currentlyServing ? (
+        ) : servingCard ? (
           <>
-            <p className="current-queue-number">Queue {currentlyServing.queueNumber} - {currentlyServing.fullName} (Score: {currentlyServing.score})</p>
-            <p className="current-service">Service: {currentlyServing.service}</p>
-            <p className="current-category">Category: {currentlyServing.category}</p>
+            <p className="current-queue-number">Queue {servingCard.queueNumber} - {servingCard.fullName} (Score: {servingCard.score})</p>
+            <p className="current-service">Service: {servingCard.service}</p>
+            <p className="current-category">Category: {servingCard.category}</p>
           </>
         ) : (
           <p>No one is currently being served.</p>
         )}
-        <button className="serve-next-button" onClick={handleServeNext}>Serve Next Customer</button>
+        <button className="serve-next-button" onClick={() => handleServeNext(myCounter && myCounter.id)}>Serve Next Customer</button>
       </div>
 
       <div className="anti-starvation-alerts-card">
@@ -127,7 +245,7 @@ function QueueStatus() {
                         {customer.priority.level} ({customer.priority.score})
                       </span>
                     </td>
-                    <td>{customer.waitTime} min</td> {/* Add "min" for clarity */}
+                    <td>{getWaitTime(customer.arrivalTimestamp)} min</td> {/* Add "min" for clarity */}
                     <td>{customer.urgency}</td>
                 </tr>
                 ))